@@ -16,7 +16,8 @@ CREATE TABLE IF NOT EXISTS documents (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     parsed_at TIMESTAMP NULL,
     INDEX idx_filename (filename),
-    INDEX idx_hash (file_hash)
+    INDEX idx_hash (file_hash),
+    INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Document table';
 
 -- Create numbered_sections table
@@ -34,9 +35,8 @@ CREATE TABLE IF NOT EXISTS numbered_sections (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE,
     FOREIGN KEY (parent_id) REFERENCES numbered_sections(id) ON DELETE CASCADE,
-    INDEX idx_document (document_id),
+    INDEX idx_doc_sort (document_id, sort_order),
     INDEX idx_parent (parent_id),
-    INDEX idx_sort (sort_order),
     UNIQUE KEY unique_doc_number (document_id, number_path)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Numbered section table';
 
@@ -52,8 +52,15 @@ CREATE TABLE IF NOT EXISTS section_tables (
     sort_order INT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (section_id) REFERENCES numbered_sections(id) ON DELETE CASCADE,
-    INDEX idx_section (section_id)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Section table table';
+    INDEX idx_section_table_section_sort (section_id, sort_order)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED COMMENT='Section table table';
+
+-- Create image_blobs table
+CREATE TABLE IF NOT EXISTS image_blobs (
+    hash VARCHAR(64) PRIMARY KEY COMMENT 'Image SHA256 hash',
+    data LONGBLOB NOT NULL COMMENT 'Raw image bytes',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Content-addressed image data table';
 
 -- Create section_images table
 CREATE TABLE IF NOT EXISTS section_images (
@@ -62,13 +69,15 @@ CREATE TABLE IF NOT EXISTS section_images (
     image_index INT NOT NULL COMMENT 'Image order in section',
     filename VARCHAR(255) NOT NULL COMMENT 'Original filename',
     mime_type VARCHAR(64) NOT NULL COMMENT 'MIME type',
-    base64_data LONGTEXT NOT NULL COMMENT 'Base64 encoded image data',
+    blob_hash VARCHAR(64) NOT NULL COMMENT 'Hash of the image data in image_blobs',
     width INT COMMENT 'Width in pixels',
     height INT COMMENT 'Height in pixels',
     sort_order INT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (section_id) REFERENCES numbered_sections(id) ON DELETE CASCADE,
-    INDEX idx_section (section_id)
+    FOREIGN KEY (blob_hash) REFERENCES image_blobs(hash),
+    INDEX idx_section_image_section_sort (section_id, sort_order),
+    INDEX idx_section_image_blob (blob_hash)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Section image table';
 
 -- Grant privileges to doc_user
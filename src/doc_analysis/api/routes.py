@@ -1,20 +1,30 @@
 """文档分析API路由。"""
 import io
+import asyncio
+import hashlib
+import functools
+import tempfile
 import uuid
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from src.doc_analysis.config import settings
+from src.doc_analysis.config import get_settings
 from src.doc_analysis.logger import get_logger
 from src.doc_analysis.db.session import get_db
 from src.doc_analysis.db.models import (
     Base,
     Document,
     NumberedSection,
+    SectionImage,
     DocumentParseResponse,
     DocumentDetailResponse,
     DocumentBriefResponse,
@@ -28,12 +38,60 @@ from src.doc_analysis.db.models import (
     HealthResponse,
 )
 from src.doc_analysis.db import crud
-from src.doc_analysis.parser.docx import parse_docx_file, DocxParser, ParsedDocument, ParsedSection
-from src.doc_analysis.parser.renderer import RichTextRenderer, RenderedImage
+from src.doc_analysis.parser.docx import (
+    parse_docx_by_heading,
+    parse_docx_file,
+    ParsedDocument,
+    ParsedSection,
+)
+from src.doc_analysis.parser.renderer import (
+    IMAGE_REF_PREFIX,
+    RichTextRenderer,
+    RenderedImage,
+    encode_image_to_base64,
+    resolve_image_refs,
+)
 
-router = APIRouter(prefix=settings.api_prefix, tags=["documents"])
+# The API prefix is applied when the app includes the router (see main.create_app)
+router = APIRouter(tags=["documents"])
 logger = get_logger(__name__)
 
+# Uploads are copied in chunks into a temp file that stays in memory up to
+# _UPLOAD_SPOOL_SIZE bytes and rolls over to disk beyond that
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+_UPLOAD_SPOOL_SIZE = 4 * 1024 * 1024
+
+# Worker processes for parsing, created at application startup when
+# parse_workers > 0
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_parse_pool() -> None:
+    """创建解析进程池（parse_workers 为 0 时不创建）。
+
+    使用 spawn 启动方式：工作进程不继承父进程的数据库连接池、线程和锁，
+    避免 fork 一个已在运行的多线程服务进程。
+    """
+    global _parse_pool
+    if _parse_pool is None and get_settings().parse_workers > 0:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=get_settings().parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+def _get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """获取解析进程池；未创建时返回 None。"""
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    """关闭解析进程池（如已创建）。"""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown()
+        _parse_pool = None
+
 
 @router.get("/health", response_model=HealthResponse)
 def health_check(db: Session = Depends(get_db)):
@@ -69,27 +127,63 @@ async def parse_document(
             detail="Only .docx files are supported",
         )
 
-    # Read file content
-    file_content = await file.read()
-
-    # Validate file size
-    file_size_mb = len(file_content) / (1024 * 1024)
-    if file_size_mb > settings.max_file_size_mb:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size exceeds maximum allowed size of {settings.max_file_size_mb}MB",
-        )
+    # Stream file content into a spooled temp file, hashing it on the way and
+    # rejecting it as soon as it grows past the size limit
+    max_file_size = get_settings().max_file_size_mb * 1024 * 1024
+    spool = tempfile.SpooledTemporaryFile(max_size=_UPLOAD_SPOOL_SIZE)
+    hasher = hashlib.sha256()
+    file_size = 0
+    while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+        file_size += len(chunk)
+        if file_size > max_file_size:
+            spool.close()
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File size exceeds maximum allowed size of {get_settings().max_file_size_mb}MB",
+            )
+        spool.write(chunk)
+        hasher.update(chunk)
 
     # Validate MIME type
-    if file.content_type and file.content_type not in settings.allowed_mime_types:
+    if file.content_type and file.content_type not in get_settings().allowed_mime_types:
         logger.warning(
             f"File {file.filename} has unexpected MIME type: {file.content_type}"
         )
 
-    # Parse document using heading styles
+    # Check for duplicate (by hash) before parsing; a known file is served
+    # from the stored sections without re-running the parser
+    file_hash = hasher.hexdigest()
+    existing = await run_in_threadpool(crud.get_document_by_hash, db, file_hash)
+    if existing:
+        spool.close()
+        return await run_in_threadpool(
+            _document_parse_response, db, existing.id, existing.filename
+        )
+
+    # Parse document using heading styles, off the event loop; with a process
+    # pool the bytes are sent to a worker so parsing is not bound by the GIL
     try:
-        parser = DocxParser()
-        parsed = parser.parse_by_heading(file_content, file.filename)
+        parse_pool = _get_parse_pool()
+        if parse_pool is not None:
+            spool.seek(0)
+            parsed = await asyncio.get_running_loop().run_in_executor(
+                parse_pool,
+                functools.partial(
+                    parse_docx_by_heading,
+                    spool.read(),
+                    file.filename,
+                    file_hash=file_hash,
+                    file_size=file_size,
+                ),
+            )
+        else:
+            parsed = await run_in_threadpool(
+                parse_docx_by_heading,
+                spool,
+                file.filename,
+                file_hash=file_hash,
+                file_size=file_size,
+            )
     except OSError as e:
         logger.error(f"File I/O error while parsing document: {e}", exc_info=True)
         raise HTTPException(
@@ -102,127 +196,184 @@ async def parse_document(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to parse document",
         )
+    finally:
+        spool.close()
 
-    # Check for duplicate (by hash)
-    existing = crud.get_document_by_hash(db, parsed.file_hash)
-    if existing:
-        # Return existing document
-        sections = crud.get_sections_by_document(db, existing.id)
-        section_responses = [_section_to_response(s, db) for s in sections]
-
-        return DocumentParseResponse(
-            document_id=existing.id,
-            filename=existing.filename,
-            sections_count=len(section_responses),
-            sections=section_responses,
-        )
+    # Rendering and database writes are synchronous; keep them off the event loop
+    return await run_in_threadpool(_store_parsed_document, db, parsed, file.filename)
+
+
+def _store_parsed_document(
+    db: Session, parsed: ParsedDocument, original_filename: str
+) -> DocumentParseResponse:
+    """存储解析结果并返回解析响应。
 
-    # Create new document record
-    stored_filename = f"{uuid.uuid4()}_{file.filename}"
+    同一文件被并发上传时，后提交的请求会违反 file_hash 唯一约束；
+    此时回滚并返回先提交的文档，而不是返回 500。
+    """
+    try:
+        return _insert_parsed_document(db, parsed, original_filename)
+    except IntegrityError:
+        db.rollback()
+        existing = crud.get_document_by_hash(db, parsed.file_hash)
+        if existing is None:
+            raise
+        logger.info(f"Document {parsed.file_hash} was stored by a concurrent upload")
+        return _document_parse_response(db, existing.id, existing.filename)
+
+
+def _insert_parsed_document(
+    db: Session, parsed: ParsedDocument, original_filename: str
+) -> DocumentParseResponse:
+    """渲染解析结果并存储到数据库，返回解析响应。
+
+    文档、章节、表格和图片在同一个事务中写入，最后统一提交；
+    任何写入失败时都不会留下没有章节的文档记录。
+    """
+    # Create new document record; committed together with its sections below
+    stored_filename = f"{uuid.uuid4()}_{original_filename}"
     doc = crud.create_document(
         db=db,
         filename=stored_filename,
-        original_filename=file.filename,
+        original_filename=original_filename,
         file_size=parsed.file_size,
         file_hash=parsed.file_hash,
+        commit=False,
     )
-
-    # Build section path map for parent lookups
-    path_to_id: Dict[str, int] = {}
-    sort_order = 0
-
-    # First pass: create sections
-    for parsed_section in parsed.sections:
-        sort_order += 1
-
-        # Get parent ID from parent info
-        parent_id = None
+    doc_id = doc.id
+
+    # First pass: render sections; parent IDs are resolved after the bulk insert
+    section_rows: List[Dict[str, Any]] = []
+    renderer = RichTextRenderer()
+    for sort_order, parsed_section in enumerate(parsed.sections, start=1):
+        # Get parent number path from parent info
+        parent_path = None
         if parsed_section.parent and parsed_section.parent.get("number_path"):
-            parent_id = path_to_id.get(parsed_section.parent["number_path"])
+            parent_path = parsed_section.parent["number_path"]
 
-        # Generate content with title
-        renderer = RichTextRenderer()
+        # Generate content with title, reusing one renderer for all sections
+        renderer.clear()
 
         # Add heading with number and title
-        heading_text = f"{parsed_section.number_path}"
-        if parsed_section.title:
-            heading_text += f" {parsed_section.title}"
+        heading_text = (
+            f"{parsed_section.number_path} {parsed_section.title}"
+            if parsed_section.title
+            else parsed_section.number_path
+        )
         renderer.add_heading(heading_text, level=min(parsed_section.level + 1, 6))
 
-        # Add content items in order (paragraphs, tables, images in original document order)
+        # Add content items in order (paragraphs, tables, images in original document order).
+        # Images are referenced by index; their data is stored once in section_images.
+        image_indexes = {id(image): idx for idx, image in enumerate(parsed_section.images)}
         for item in parsed_section.content_items:
             if item.type == "paragraph":
                 renderer.add_paragraph(item.data)
             elif item.type == "table":
                 renderer.add_table(item.data)
             elif item.type == "image":
-                renderer.add_image(item.data)
+                renderer.add_image(item.data, image_index=image_indexes.get(id(item.data)))
 
-        content_html = renderer.render_html()
-        content_json = renderer.render_json()
+        # HTML is rendered from content_json on read (see _section_content_html)
+        content_json = renderer.render_json_str()
 
         # Build marked_content from marked_paragraphs
         marked_content = "\n".join(parsed_section.marked_paragraphs) if parsed_section.marked_paragraphs else None
 
-        section = crud.create_section(
-            db=db,
-            document_id=doc.id,
-            number_path=parsed_section.number_path,
-            level=parsed_section.level,
-            parent_id=parent_id,
-            title=parsed_section.title,
-            content_html=content_html,
-            content_json=str(content_json),
-            marked_content=marked_content,
-            sort_order=sort_order,
+        section_rows.append(
+            {
+                "number_path": parsed_section.number_path,
+                "level": parsed_section.level,
+                "parent_path": parent_path,
+                "title": parsed_section.title,
+                "content_html": None,
+                "content_json": content_json,
+                "marked_content": marked_content,
+                "sort_order": sort_order,
+            }
         )
 
-        path_to_id[parsed_section.number_path] = section.id
+    path_to_id = crud.bulk_create_sections(db, doc_id, section_rows)
+
+    # Second pass: collect tables and images against the new section IDs
+    table_rows: List[Dict[str, Any]] = []
+    image_rows: List[Dict[str, Any]] = []
+    # Image bytes are stored once per distinct content, keyed by SHA256
+    image_blobs: Dict[str, bytes] = {}
+    blob_hashes: Dict[int, str] = {}
+    for parsed_section in parsed.sections:
+        section_id = path_to_id[parsed_section.number_path]
 
-        # Store tables
         for idx, table in enumerate(parsed_section.tables):
-            crud.create_table(
-                db=db,
-                section_id=section.id,
-                table_index=idx,
-                row_count=table.rows,
-                col_count=table.cols,
-                html=table.html,
-                json_data=str(table.json_data) if table.json_data else None,
-                sort_order=idx,
+            table_rows.append(
+                {
+                    "section_id": section_id,
+                    "table_index": idx,
+                    "row_count": table.rows,
+                    "col_count": table.cols,
+                    "html": table.html,
+                    "json_data": orjson.dumps(table.json_data).decode() if table.json_data else None,
+                    "sort_order": idx,
+                }
             )
 
-        # Store images
         for idx, image in enumerate(parsed_section.images):
-            try:
-                crud.create_image(
-                    db=db,
-                    section_id=section.id,
-                    image_index=idx,
-                    filename=image.filename,
-                    mime_type=image.mime_type,
-                    base64_data=image.base64_data,
-                    width=image.width,
-                    height=image.height,
-                    sort_order=idx,
-                )
-            except Exception as e:
-                # Log error but continue processing other images
-                logger.warning(
-                    f"Failed to store image {image.filename} in section {section.number_path}: {e}",
-                    exc_info=True,
-                )
-
-    # Mark document as parsed
-    crud.mark_document_parsed(db, doc.id)
-
-    # Get all sections for response
-    sections = crud.get_sections_by_document(db, doc.id)
+            blob_hash = blob_hashes.get(id(image))
+            if blob_hash is None:
+                data = image.get_data()
+                blob_hash = hashlib.sha256(data).hexdigest()
+                blob_hashes[id(image)] = blob_hash
+                image_blobs[blob_hash] = data
+            image_rows.append(
+                {
+                    "section_id": section_id,
+                    "image_index": idx,
+                    "filename": image.filename,
+                    "mime_type": image.mime_type,
+                    # Raw bytes are stored in image_blobs; base64 is produced when serving
+                    "blob_hash": blob_hash,
+                    "width": image.width,
+                    "height": image.height,
+                    "sort_order": idx,
+                }
+            )
+
+    crud.bulk_create_tables(db, table_rows)
+
+    # Blob storage failures are not image-specific (e.g. a lost connection) and
+    # abort the whole upload instead of silently dropping its images
+    crud.store_image_blobs(db, image_blobs)
+
+    if image_rows:
+        try:
+            with db.begin_nested():
+                crud.bulk_create_images(db, image_rows)
+        except Exception as e:
+            # Log error but keep the sections and tables
+            logger.warning(
+                f"Failed to store {len(image_rows)} images for document {doc_id}: {e}",
+                exc_info=True,
+            )
+
+    # Mark document as parsed and commit all writes at once; if anything above
+    # raised, the session is closed without committing and nothing is stored
+    crud.mark_document_parsed(db, doc_id, commit=False)
+    db.commit()
+
+    return _document_parse_response(db, doc_id, stored_filename)
+
+
+def _document_parse_response(
+    db: Session, document_id: int, filename: str
+) -> DocumentParseResponse:
+    """读取文档的全部章节并构建解析响应。"""
+    sections = crud.get_sections_by_document(
+        db, document_id, include_html=get_settings().content_format != "json"
+    )
     section_responses = [_section_to_response(s, db) for s in sections]
 
     return DocumentParseResponse(
-        document_id=doc.id,
-        filename=stored_filename,
+        document_id=document_id,
+        filename=filename,
         sections_count=len(section_responses),
         sections=section_responses,
     )
@@ -241,7 +392,9 @@ def get_document(
             detail="文档不存在",
         )
 
-    sections = crud.get_sections_by_document(db, document_id)
+    sections = crud.get_sections_by_document(
+        db, document_id, include_html=get_settings().content_format != "json"
+    )
     section_responses = [_section_to_response(s, db) for s in sections]
 
     return DocumentDetailResponse(
@@ -272,7 +425,7 @@ def get_section_by_path(
             detail="章节不存在",
         )
 
-    response = _section_to_detail_response(section, db)
+    response = _section_to_detail_response(section)
     return response
 
 
@@ -285,7 +438,7 @@ def get_sections_tree(
     db: Session = Depends(get_db),
 ):
     """获取所有章节的层次结构树。"""
-    sections = crud.get_sections_by_document(db, document_id)
+    sections = crud.get_section_outline(db, document_id)
     tree = crud.build_section_tree(sections)
 
     return SectionTreeResponse(tree=tree)
@@ -309,9 +462,9 @@ def get_documents(
     if page < 1:
         page = 1
     if page_size < 1:
-        page_size = settings.default_page_size
-    elif page_size > settings.max_page_size:
-        page_size = settings.max_page_size
+        page_size = get_settings().default_page_size
+    elif page_size > get_settings().max_page_size:
+        page_size = get_settings().max_page_size
 
     # Get documents with section counts (optimized single query)
     documents, total_count, section_counts = crud.get_documents_with_section_counts(
@@ -377,28 +530,33 @@ def _section_to_response(
     section: NumberedSection, db: Session
 ) -> SectionResponse:
     """将数据库章节转换为API响应。"""
-    # 根据配置决定是否返回 content_html 和 content_json
-    content_html = None
-    content_json = None
-
-    if settings.content_format == "html":
-        content_html = section.content_html
-    elif settings.content_format == "json":
-        content_json = section.content_json
-    else:  # "both" or any other value
-        content_html = section.content_html
-        content_json = section.content_json
-
     # 根据配置决定是否返回 tables 和 images
     tables = None
     images = None
 
-    if settings.include_tables:
+    if get_settings().include_tables:
         tables = [_table_to_response(t) for t in section.tables]
 
-    if settings.include_images:
+    if get_settings().include_images:
         images = [_image_to_response(i) for i in section.images]
 
+    # 根据配置决定是否返回 content_html 和 content_json
+    content_html = None
+    content_json = None
+
+    if get_settings().content_format == "html":
+        content_html = _section_content_html(section)
+    elif get_settings().content_format == "json":
+        content_json = _section_content_json(section)
+    else:  # "both" or any other value
+        data_uris = (
+            _section_image_data_uris(section, images)
+            if section.content_json and IMAGE_REF_PREFIX in section.content_json
+            else None
+        )
+        content_html = _section_content_html(section, data_uris)
+        content_json = _section_content_json(section, data_uris)
+
     return SectionResponse(
         id=section.id,
         number_path=section.number_path,
@@ -412,39 +570,38 @@ def _section_to_response(
     )
 
 
-def _section_to_detail_response(
-    section: NumberedSection, db: Session
-) -> SectionDetailResponse:
+def _section_to_detail_response(section: NumberedSection) -> SectionDetailResponse:
     """将数据库章节转换为详细的API响应。"""
-    # 根据配置决定是否返回 content_html 和 content_json
-    content_html = None
-    content_json = None
-
-    if settings.content_format == "html":
-        content_html = section.content_html
-    elif settings.content_format == "json":
-        content_json = section.content_json
-    else:  # "both" or any other value
-        content_html = section.content_html
-        content_json = section.content_json
-
     # 根据配置决定是否返回 tables 和 images
     tables = None
     images = None
 
-    if settings.include_tables:
+    if get_settings().include_tables:
         tables = [_table_to_response(t) for t in section.tables]
 
-    if settings.include_images:
+    if get_settings().include_images:
         images = [_image_to_response(i) for i in section.images]
 
+    # 根据配置决定是否返回 content_html 和 content_json
+    content_html = None
+    content_json = None
+
+    if get_settings().content_format == "html":
+        content_html = _section_content_html(section)
+    elif get_settings().content_format == "json":
+        content_json = _section_content_json(section)
+    else:  # "both" or any other value
+        data_uris = (
+            _section_image_data_uris(section, images)
+            if section.content_json and IMAGE_REF_PREFIX in section.content_json
+            else None
+        )
+        content_html = _section_content_html(section, data_uris)
+        content_json = _section_content_json(section, data_uris)
+
     parent = None
     if section.parent_id:
-        parent_section = (
-            db.query(NumberedSection)
-            .filter(NumberedSection.id == section.parent_id)
-            .first()
-        )
+        parent_section = section.parent
         if parent_section:
             parent = SectionBriefResponse(
                 id=parent_section.id,
@@ -478,6 +635,62 @@ def _section_to_detail_response(
     )
 
 
+def _section_image_data_uris(
+    section: NumberedSection, images: Optional[List[ImageResponse]] = None
+) -> Dict[int, str]:
+    """按 image_index 构建章节图片的 data URI。
+
+    传入已构建的图片响应时直接复用其 base64 数据，避免重复编码。
+    """
+    if images is not None:
+        return {
+            image.image_index: f"data:{image.mime_type};base64,{image.base64_data}"
+            for image in images
+        }
+    return {
+        image.image_index: f"data:{image.mime_type};base64,{_image_base64(image)}"
+        for image in section.images
+    }
+
+
+def _section_content_json(
+    section: NumberedSection, data_uris: Optional[Dict[int, str]] = None
+) -> Optional[str]:
+    """获取章节 content_json，并将 image://<index> 引用替换为图片 data URI。"""
+    content_json = section.content_json
+    if not content_json or IMAGE_REF_PREFIX not in content_json:
+        return content_json
+    if data_uris is None:
+        data_uris = _section_image_data_uris(section)
+    return resolve_image_refs(content_json, data_uris)
+
+
+def _section_content_html(
+    section: NumberedSection, data_uris: Optional[Dict[int, str]] = None
+) -> Optional[str]:
+    """获取章节HTML；未存储时根据 content_json 渲染，再替换图片引用。"""
+    if section.content_html is not None:
+        return section.content_html
+    if not section.content_json:
+        return None
+    content_html = _render_html_from_json(section.content_json)
+    if not content_html or IMAGE_REF_PREFIX not in content_html:
+        return content_html
+    if data_uris is None:
+        data_uris = _section_image_data_uris(section)
+    return resolve_image_refs(content_html, data_uris, html=True)
+
+
+def _render_html_from_json(content_json: str) -> Optional[str]:
+    """将 content_json 渲染为HTML。"""
+    try:
+        doc_json = orjson.loads(content_json)
+    except ValueError as e:
+        logger.warning(f"Failed to decode section content_json: {e}")
+        return None
+    return RichTextRenderer.render_html_from_json(doc_json)
+
+
 def _table_to_response(table) -> TableResponse:
     """将数据库表格转换为API响应。"""
 
@@ -491,6 +704,11 @@ def _table_to_response(table) -> TableResponse:
     )
 
 
+def _image_base64(image: SectionImage) -> str:
+    """从共享的 image_blobs 中读取图片数据并编码为 base64。"""
+    return encode_image_to_base64(image.blob.data, image.mime_type)
+
+
 def _image_to_response(image) -> ImageResponse:
     """将数据库图片转换为API响应。"""
 
@@ -499,7 +717,7 @@ def _image_to_response(image) -> ImageResponse:
         image_index=image.image_index,
         filename=image.filename,
         mime_type=image.mime_type,
-        base64_data=image.base64_data,
+        base64_data=_image_base64(image),
         width=image.width,
         height=image.height,
     )
@@ -1,13 +1,17 @@
 """Database CRUD operations."""
 import hashlib
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Sequence
 from datetime import datetime, timezone
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Row, delete, exists, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, defer, joinedload, load_only, raiseload, selectinload
 from sqlalchemy.sql import func
 
 from src.doc_analysis.db.models import (
     Document,
+    ImageBlob,
     NumberedSection,
     SectionTable,
     SectionImage,
@@ -25,8 +29,13 @@ def create_document(
     original_filename: str,
     file_size: int,
     file_hash: str,
+    commit: bool = True,
 ) -> Document:
-    """Create a new document."""
+    """Create a new document.
+
+    With ``commit=False`` the row is only flushed (so ``doc.id`` is set) and
+    the caller commits it together with the rest of its writes.
+    """
     doc = Document(
         filename=filename,
         original_filename=original_filename,
@@ -34,8 +43,11 @@ def create_document(
         file_hash=file_hash,
     )
     db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    if commit:
+        db.commit()
+        db.refresh(doc)
+    else:
+        db.flush()
     return doc
 
 
@@ -49,13 +61,14 @@ def get_document_by_hash(db: Session, file_hash: str) -> Optional[Document]:
     return db.query(Document).filter(Document.file_hash == file_hash).first()
 
 
-def mark_document_parsed(db: Session, doc_id: int) -> None:
-    """Mark document as parsed."""
+def mark_document_parsed(db: Session, doc_id: int, commit: bool = True) -> None:
+    """Mark document as parsed. With ``commit=False`` the caller commits."""
     doc = get_document_by_id(db, doc_id)
     if doc:
         # Use func.now() to get database server time, avoiding timezone issues
         doc.parsed_at = func.now()
-        db.commit()
+        if commit:
+            db.commit()
 
 
 def create_section(
@@ -88,28 +101,133 @@ def create_section(
     return section
 
 
-def get_sections_by_document(db: Session, document_id: int) -> List[NumberedSection]:
-    """Get all sections for a document."""
-    return (
+def bulk_create_sections(
+    db: Session, document_id: int, sections: List[Dict[str, Any]]
+) -> Dict[str, int]:
+    """Insert numbered sections in bulk and link them to their parents.
+
+    Sections are inserted with a single executemany, then parent IDs are
+    resolved from the returned number paths and applied in one batch.
+    The caller is responsible for committing.
+
+    Args:
+        db: Database session
+        document_id: ID of the owning document
+        sections: Section column values; each may carry a ``parent_path``
+            (number path of the parent section) instead of ``parent_id``
+
+    Returns:
+        Dict mapping number_path to the new section ID
+    """
+    rows = []
+    parent_pairs: List[Tuple[str, str]] = []
+    for section in sections:
+        row = dict(section)
+        parent_path = row.pop("parent_path", None)
+        if parent_path is not None:
+            parent_pairs.append((row["number_path"], parent_path))
+        row["document_id"] = document_id
+        row["parent_id"] = None
+        rows.append(row)
+
+    if not rows:
+        return {}
+    db.execute(insert(NumberedSection), rows)
+
+    # Plain (path, id) tuples straight from a Core select; no ORM query layer
+    path_to_id = dict(
+        db.execute(
+            select(NumberedSection.number_path, NumberedSection.id)
+            .where(NumberedSection.document_id == document_id)
+        ).all()
+    )
+
+    parent_updates = [
+        {"id": path_to_id[path], "parent_id": path_to_id[parent_path]}
+        for path, parent_path in parent_pairs
+        if parent_path in path_to_id
+    ]
+    if parent_updates:
+        db.execute(update(NumberedSection), parent_updates)
+
+    return path_to_id
+
+
+def get_sections_by_document(
+    db: Session, document_id: int, include_html: bool = True
+) -> List[NumberedSection]:
+    """Get all sections for a document.
+
+    Tables and images are loaded with one extra SELECT each instead of
+    being joined, which would repeat every section row per table x image.
+
+    Args:
+        db: Database session
+        document_id: ID of the owning document
+        include_html: Whether to load the stored content_html; callers that
+            only serve JSON content can skip reading it
+
+    Relationships other than tables and images raise instead of lazy
+    loading, so a new access to e.g. ``section.parent`` fails loudly rather
+    than issuing one query per section; load it explicitly if needed.
+    """
+    query = (
         db.query(NumberedSection)
         .filter(NumberedSection.document_id == document_id)
         .order_by(NumberedSection.sort_order)
-        .options(joinedload(NumberedSection.images), joinedload(NumberedSection.tables))
-        .all()
+        .options(
+            selectinload(NumberedSection.tables),
+            selectinload(NumberedSection.images).selectinload(SectionImage.blob),
+            raiseload("*"),
+        )
     )
+    if not include_html:
+        query = query.options(defer(NumberedSection.content_html))
+    return query.all()
+
+
+def get_section_outline(db: Session, document_id: int) -> List[Row]:
+    """Get the sections of a document as plain rows of the columns a tree needs.
+
+    Rows are returned without building ORM objects; they expose ``id``,
+    ``parent_id``, ``number_path``, ``level`` and ``title`` as attributes.
+    """
+    return db.execute(
+        select(
+            NumberedSection.id,
+            NumberedSection.parent_id,
+            NumberedSection.number_path,
+            NumberedSection.level,
+            NumberedSection.title,
+        )
+        .where(NumberedSection.document_id == document_id)
+        .order_by(NumberedSection.sort_order)
+    ).all()
 
 
 def get_section_by_path(
     db: Session, document_id: int, number_path: str
 ) -> Optional[NumberedSection]:
-    """Get section by number path within a document."""
+    """Get section by number path within a document.
+
+    The parent and children used by the detail response are loaded eagerly
+    so building it needs no further queries; any other relationship raises
+    on access instead of lazy loading. Tables and images use separate
+    IN queries; joining both would repeat every image row once per table.
+    """
     return (
         db.query(NumberedSection)
         .filter(
             NumberedSection.document_id == document_id,
             NumberedSection.number_path == number_path,
         )
-        .options(joinedload(NumberedSection.images), joinedload(NumberedSection.tables))
+        .options(
+            selectinload(NumberedSection.images).selectinload(SectionImage.blob),
+            selectinload(NumberedSection.tables),
+            joinedload(NumberedSection.parent),
+            selectinload(NumberedSection.children),
+            raiseload("*"),
+        )
         .first()
     )
 
@@ -146,18 +264,20 @@ def create_image(
     image_index: int,
     filename: str,
     mime_type: str,
-    base64_data: str,
+    data: bytes,
     width: Optional[int],
     height: Optional[int],
     sort_order: int,
 ) -> SectionImage:
-    """Create a new section image."""
+    """Create a new section image, storing its data in image_blobs."""
+    blob_hash = calculate_file_hash(data)
+    store_image_blobs(db, {blob_hash: data})
     image = SectionImage(
         section_id=section_id,
         image_index=image_index,
         filename=filename,
         mime_type=mime_type,
-        base64_data=base64_data,
+        blob_hash=blob_hash,
         width=width,
         height=height,
         sort_order=sort_order,
@@ -168,10 +288,62 @@ def create_image(
     return image
 
 
-def build_section_tree(sections: List[NumberedSection]) -> List[Dict[str, Any]]:
-    """Build hierarchical tree from flat section list."""
+def bulk_create_tables(db: Session, tables: List[Dict[str, Any]]) -> None:
+    """Insert section tables in bulk. The caller is responsible for committing."""
+    if tables:
+        db.execute(insert(SectionTable), tables)
 
-    def section_to_dict(s: NumberedSection) -> Dict[str, Any]:
+
+def bulk_create_images(db: Session, images: List[Dict[str, Any]]) -> None:
+    """Insert section images in bulk. The caller is responsible for committing."""
+    if images:
+        db.execute(insert(SectionImage), images)
+
+
+def store_image_blobs(db: Session, blobs: Dict[str, bytes]) -> None:
+    """Store image data that is not already present, keyed by SHA256 hash.
+
+    Blobs that already exist are locked (SELECT ... FOR UPDATE) so a
+    concurrent delete_document cannot drop them before this transaction's
+    image rows reference them. Missing blobs are inserted as an upsert that
+    ignores duplicate keys, so a concurrent upload storing the same image
+    first is not an error; any other failure propagates.
+    The caller is responsible for committing.
+
+    Args:
+        db: Database session
+        blobs: Mapping of hex SHA256 digest to raw image bytes
+    """
+    if not blobs:
+        return
+
+    stored = set(
+        db.execute(
+            select(ImageBlob.hash).where(ImageBlob.hash.in_(list(blobs))).with_for_update()
+        ).scalars()
+    )
+    rows = [{"hash": h, "data": data} for h, data in blobs.items() if h not in stored]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(ImageBlob)
+        stmt = stmt.on_duplicate_key_update(hash=stmt.inserted.hash)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(ImageBlob).on_conflict_do_nothing(index_elements=["hash"])
+    else:
+        stmt = insert(ImageBlob)
+    db.execute(stmt, rows)
+
+
+def build_section_tree(sections: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Build hierarchical tree from flat section list.
+
+    Accepts NumberedSection objects or rows from get_section_outline.
+    """
+
+    def section_to_dict(s: Any) -> Dict[str, Any]:
         return {
             "id": s.id,
             "number_path": s.number_path,
@@ -229,9 +401,11 @@ def get_documents_with_pagination(db: Session, page: int = 1, page_size: int = 1
 def get_documents_with_section_counts(
     db: Session, page: int = 1, page_size: int = 10
 ) -> Tuple[List[Document], int, Dict[int, int]]:
-    """Get documents with section counts in a single query.
+    """Get documents with section counts in a single grouped query.
 
-    This avoids the N+1 query problem by using a subquery to count sections.
+    The page of document IDs is selected in a derived table first, then
+    joined to its documents and LEFT OUTER JOINed to their sections, so only
+    the sections of the ``page_size`` documents on the page are counted.
 
     Args:
         db: Database session
@@ -245,32 +419,27 @@ def get_documents_with_section_counts(
     # Calculate offset
     offset = (page - 1) * page_size
 
-    # Subquery to count sections per document
-    from sqlalchemy import func
-
-    section_counts = (
-        db.query(
-            NumberedSection.document_id,
-            func.count(NumberedSection.id).label("section_count"),
-        )
-        .group_by(NumberedSection.document_id)
-        .all()
-    )
-
-    # Convert to dict for easy lookup
-    section_counts_dict = {doc_id: count for doc_id, count in section_counts}
-
     # Get total count
     total_count = db.query(Document).count()
 
-    # Get documents with pagination
-    documents = (
-        db.query(Document)
-        .order_by(Document.created_at.desc())
+    # Get the page of documents with their section counts
+    page_ids = (
+        select(Document.id)
+        .order_by(Document.created_at.desc(), Document.id.desc())
         .offset(offset)
         .limit(page_size)
-        .all()
+        .subquery()
     )
+    rows = db.execute(
+        select(Document, func.count(NumberedSection.id))
+        .join(page_ids, page_ids.c.id == Document.id)
+        .outerjoin(NumberedSection, NumberedSection.document_id == Document.id)
+        .group_by(Document.id)
+        .order_by(Document.created_at.desc(), Document.id.desc())
+    ).all()
+
+    documents = [doc for doc, _ in rows]
+    section_counts_dict: Dict[int, int] = {doc.id: count for doc, count in rows}
 
     return documents, total_count, section_counts_dict
 
@@ -290,11 +459,50 @@ def delete_document(db: Session, document_id: int) -> bool:
     Returns:
         True if document was deleted, False if not found
     """
-    doc = db.query(Document).filter(Document.id == document_id).first()
+    # The ORM cascade walks every section's tables, images and children;
+    # load them up front with one IN query per relationship instead of
+    # lazily per section. Only the keys are needed, so the large content
+    # and image columns are never read (primary keys are always loaded).
+    doc = (
+        db.query(Document)
+        .options(
+            selectinload(Document.sections).options(
+                load_only(NumberedSection.document_id, NumberedSection.parent_id),
+                selectinload(NumberedSection.tables).load_only(SectionTable.section_id),
+                selectinload(NumberedSection.images).load_only(
+                    SectionImage.section_id, SectionImage.blob_hash
+                ),
+                selectinload(NumberedSection.children).load_only(
+                    NumberedSection.document_id, NumberedSection.parent_id
+                ),
+            )
+        )
+        .filter(Document.id == document_id)
+        .first()
+    )
     if not doc:
         return False
 
+    blob_hashes = {image.blob_hash for section in doc.sections for image in section.images}
+    if blob_hashes:
+        # Lock the blobs before removing any image rows: an upload that found
+        # one of them existing holds the same lock until it commits, so the
+        # orphan check below sees its new references
+        db.execute(
+            select(ImageBlob.hash).where(ImageBlob.hash.in_(blob_hashes)).with_for_update()
+        ).all()
+
     # Delete will cascade to sections, tables, and images
     db.delete(doc)
+
+    # Drop image data no other document still references
+    if blob_hashes:
+        db.flush()
+        db.execute(
+            delete(ImageBlob).where(
+                ImageBlob.hash.in_(blob_hashes),
+                ~exists().where(SectionImage.blob_hash == ImageBlob.hash),
+            )
+        )
     db.commit()
     return True
@@ -12,7 +12,9 @@ from sqlalchemy import (
     TIMESTAMP,
     ForeignKey,
     Index,
+    LargeBinary,
 )
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field
@@ -43,12 +45,13 @@ class Document(Base):
         "NumberedSection",
         back_populates="document",
         cascade="all, delete-orphan",
-        order_by="NumberedSection.sort_order",
+        order_by=lambda: NumberedSection.sort_order,
     )
 
     __table_args__ = (
         Index("idx_filename", "filename"),
         Index("idx_hash", "file_hash"),
+        Index("idx_created_at", "created_at"),  # Document list is ordered by created_at
         {"comment": "Document table"},
     )
 
@@ -94,19 +97,18 @@ class NumberedSection(Base):
         "SectionTable",
         back_populates="section",
         cascade="all, delete-orphan",
-        order_by="SectionTable.sort_order",
+        order_by=lambda: SectionTable.sort_order,
     )
     images = relationship(
         "SectionImage",
         back_populates="section",
         cascade="all, delete-orphan",
-        order_by="SectionImage.sort_order",
+        order_by=lambda: SectionImage.sort_order,
     )
 
     __table_args__ = (
-        Index("idx_document", "document_id"),
+        Index("idx_doc_sort", "document_id", "sort_order"),
         Index("idx_parent", "parent_id"),
-        Index("idx_sort", "sort_order"),
         Index("unique_doc_number", "document_id", "number_path", unique=True),
         {"comment": "Numbered section table"},
     )
@@ -135,11 +137,28 @@ class SectionTable(Base):
     section = relationship("NumberedSection", back_populates="tables")
 
     __table_args__ = (
-        Index("idx_section_table_section_id", "section_id"),
-        {"comment": "Section table table"},
+        Index("idx_section_table_section_sort", "section_id", "sort_order"),
+        # Table HTML and JSON compress well; let InnoDB store pages compressed
+        {"comment": "Section table table", "mysql_row_format": "COMPRESSED"},
     )
 
 
+class ImageBlob(Base):
+    """Image data stored once per distinct content and shared by section images."""
+
+    __tablename__ = "image_blobs"
+
+    hash = Column(String(64), primary_key=True, comment="Image SHA256 hash")
+    data = Column(
+        LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"),
+        nullable=False,
+        comment="Raw image bytes",
+    )
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    __table_args__ = {"comment": "Content-addressed image data table"}
+
+
 class SectionImage(Base):
     """Images associated with sections."""
 
@@ -154,7 +173,12 @@ class SectionImage(Base):
     image_index = Column(Integer, nullable=False, comment="Image order in section")
     filename = Column(String(255), nullable=False, comment="Original filename")
     mime_type = Column(String(64), nullable=False, comment="MIME type")
-    base64_data = Column(Text(length=4294967295), nullable=False, comment="Base64 encoded image data")
+    blob_hash = Column(
+        String(64),
+        ForeignKey("image_blobs.hash"),
+        nullable=False,
+        comment="Hash of the image data in image_blobs",
+    )
     width = Column(Integer, comment="Width in pixels")
     height = Column(Integer, comment="Height in pixels")
     sort_order = Column(Integer, nullable=False)
@@ -162,9 +186,11 @@ class SectionImage(Base):
 
     # Relationships
     section = relationship("NumberedSection", back_populates="images")
+    blob = relationship("ImageBlob")
 
     __table_args__ = (
-        Index("idx_section_image_section_id", "section_id"),
+        Index("idx_section_image_section_sort", "section_id", "sort_order"),
+        Index("idx_section_image_blob", "blob_hash"),
         {"comment": "Section image table"},
     )
 
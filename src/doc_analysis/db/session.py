@@ -1,24 +1,45 @@
 """Database session management."""
+import base64
+import hashlib
+
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import OperationalError, ProgrammingError
 
-from src.doc_analysis.config import settings
+from src.doc_analysis.config import get_settings
 from src.doc_analysis.db.models import Base
 
 _engine = None
 _SessionLocal = None
 
+# Single-column indexes replaced by the composite (parent, sort_order) indexes
+# in the models; init_db drops them from databases created before the change
+_SUPERSEDED_INDEXES = {
+    "numbered_sections": ("idx_document", "idx_sort"),
+    "section_tables": ("idx_section", "idx_section_table_section_id"),
+    "section_images": ("idx_section", "idx_section_image_section_id"),
+}
+
 
 def _get_engine():
     """Get or create engine lazily."""
     global _engine
     if _engine is None:
+        settings = get_settings()
+        pool_options = {}
+        if "sqlite" not in settings.database_url:
+            # Sized for the request threadpool, which holds one session per request
+            pool_options = {
+                "pool_size": settings.db_pool_size,
+                "max_overflow": settings.db_max_overflow,
+                "pool_timeout": settings.db_pool_timeout,
+            }
         _engine = create_engine(
             settings.database_url,
             pool_pre_ping=True,
             pool_recycle=3600,
             echo=settings.log_level == "DEBUG",
+            **pool_options,
         )
     return _engine
 
@@ -49,22 +70,97 @@ def get_db() -> Session:
 def init_db():
     """Initialize database tables and add missing columns if needed."""
     # Skip in testing environment (SQLite in-memory)
-    if "sqlite" in settings.database_url:
+    if "sqlite" in get_settings().database_url:
         return
 
     engine = _get_engine()
 
-    try:
-        # First, create tables that don't exist
-        Base.metadata.create_all(bind=engine, checkfirst=True)
+    # First, create tables that don't exist (legacy images are moved into
+    # image_blobs). Not caught below: serving half-converted image rows would
+    # fail on every image read, so a failed conversion stops startup instead.
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    _migrate_base64_images(engine)
 
-        # Then, add missing columns to existing tables
+    try:
+        # Then, add missing columns and indexes to existing tables
         _add_missing_columns(engine)
+        _add_missing_indexes(engine)
+        _drop_superseded_indexes(engine)
+
+        # Optionally open some connections now instead of on the first requests
+        _warm_pool(engine, get_settings().db_pool_warmup)
     except Exception as e:
         # Log but don't fail on initialization errors
         print(f"Database initialization warning: {e}")
 
 
+def _warm_pool(engine, count: int):
+    """Open up to ``count`` pooled connections, at most the pool's size."""
+    connections = []
+    try:
+        for _ in range(min(count, engine.pool.size())):
+            connections.append(engine.connect())
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def _migrate_base64_images(engine):
+    """Move legacy section_images.base64_data into image_blobs and drop the column.
+
+    Images are stored once in image_blobs and referenced by blob_hash; rows
+    written before that still carry their data as base64 text. Each row is
+    converted on its own, so a rerun after an interruption resumes where it
+    stopped.
+    """
+    inspector = inspect(engine)
+    if "section_images" not in inspector.get_table_names():
+        return
+    columns = {col["name"] for col in inspector.get_columns("section_images")}
+    if "base64_data" not in columns:
+        return
+
+    with engine.begin() as conn:
+        if "blob_hash" not in columns:
+            conn.execute(text("ALTER TABLE section_images ADD COLUMN blob_hash VARCHAR(64) NULL"))
+        image_ids = conn.execute(
+            text("SELECT id FROM section_images WHERE blob_hash IS NULL")
+        ).scalars().all()
+
+    # One image at a time, so only a single payload is held in memory
+    for image_id in image_ids:
+        with engine.begin() as conn:
+            data = base64.b64decode(conn.execute(
+                text("SELECT base64_data FROM section_images WHERE id = :id"), {"id": image_id}
+            ).scalar_one())
+            blob_hash = hashlib.sha256(data).hexdigest()
+            conn.execute(
+                text("INSERT IGNORE INTO image_blobs (hash, data) VALUES (:hash, :data)"),
+                {"hash": blob_hash, "data": data},
+            )
+            conn.execute(
+                text("UPDATE section_images SET blob_hash = :hash WHERE id = :id"),
+                {"hash": blob_hash, "id": image_id},
+            )
+
+    has_blob_fk = any(
+        fk["referred_table"] == "image_blobs"
+        for fk in inspector.get_foreign_keys("section_images")
+    )
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE section_images DROP COLUMN base64_data, "
+            "MODIFY blob_hash VARCHAR(64) NOT NULL "
+            "COMMENT 'Hash of the image data in image_blobs'"
+        ))
+        if not has_blob_fk:
+            conn.execute(text(
+                "ALTER TABLE section_images "
+                "ADD FOREIGN KEY (blob_hash) REFERENCES image_blobs(hash)"
+            ))
+    print(f"Moved {len(image_ids)} images to image_blobs and dropped section_images.base64_data")
+
+
 def _add_missing_columns(engine):
     """Add missing columns to existing tables."""
     inspector = inspect(engine)
@@ -101,3 +197,47 @@ def _add_missing_columns(engine):
                     except (OperationalError, ProgrammingError) as e:
                         # Column might have been added concurrently, ignore
                         print(f"Column add warning: {table_name}.{column.name} - {e}")
+
+
+def _add_missing_indexes(engine):
+    """Create model indexes that are missing from existing tables."""
+    inspector = inspect(engine)
+    table_names = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+
+        existing_indexes = {idx["name"] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(bind=engine)
+                print(f"Added missing index: {table.name}.{index.name}")
+            except (OperationalError, ProgrammingError) as e:
+                # Index might have been added concurrently, ignore
+                print(f"Index add warning: {table.name}.{index.name} - {e}")
+
+
+def _drop_superseded_indexes(engine):
+    """Drop indexes superseded by model indexes, once their replacements exist."""
+    inspector = inspect(engine)
+    table_names = set(inspector.get_table_names())
+
+    with engine.connect() as conn:
+        for table_name, index_names in _SUPERSEDED_INDEXES.items():
+            if table_name not in table_names:
+                continue
+
+            existing_indexes = {idx["name"] for idx in inspector.get_indexes(table_name)}
+            for index_name in index_names:
+                if index_name not in existing_indexes:
+                    continue
+                try:
+                    conn.execute(text(f"DROP INDEX {index_name} ON {table_name}"))
+                    conn.commit()
+                    print(f"Dropped superseded index: {table_name}.{index_name}")
+                except (OperationalError, ProgrammingError) as e:
+                    # Index might have been dropped concurrently, ignore
+                    print(f"Index drop warning: {table_name}.{index_name} - {e}")
@@ -4,13 +4,13 @@ import logging
 import sys
 from typing import Any
 
-from src.doc_analysis.config import settings
+from src.doc_analysis.config import get_settings
 
 
 def setup_logging() -> None:
     """Configure application logging with structured format."""
     logging.basicConfig(
-        level=settings.log_level,
+        level=get_settings().log_level,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
         handlers=[logging.StreamHandler(sys.stdout)],
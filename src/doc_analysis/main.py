@@ -1,68 +1,143 @@
 """FastAPI application entry point."""
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
-from src.doc_analysis.config import settings
+from src.doc_analysis.config import get_settings
 from src.doc_analysis.api import routes
 from src.doc_analysis.logger import setup_logging, get_logger
 from src.doc_analysis.db.session import init_db
 
 
-setup_logging()
 logger = get_logger(__name__)
 
-# Create FastAPI app
-app = FastAPI(
-    title="Document Analysis Service",
-    description="Word document parsing service with numbered sections extraction",
-    version="0.1.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configure Gzip compression
-if settings.enable_gzip:
+# Room for the multipart boundaries and part headers around the uploaded file
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class RequestSizeLimitMiddleware:
+    """Reject request bodies larger than max_file_size_mb before they are read.
+
+    Starlette parses a multipart form (spooling the file to disk) before the
+    route handler runs, so the handler's own size check comes too late to
+    stop an oversized upload. A declared Content-Length over the limit is
+    rejected up front; otherwise the body is counted as it is received and
+    the request fails with 413 as soon as it passes the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_file_size_mb = get_settings().max_file_size_mb
+        limit = max_file_size_mb * 1024 * 1024 + _MULTIPART_OVERHEAD
+        detail = f"File size exceeds maximum allowed size of {max_file_size_mb}MB"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = ORJSONResponse(
+                {"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing; FastAPI re-raises HTTPException
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail
+                    )
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+def create_app() -> FastAPI:
+    """Build the application from the current settings.
+
+    Nothing reads settings at import time except this call, which the module
+    makes once below for ``uvicorn src.doc_analysis.main:app``.
+    """
+    setup_logging()
+    settings = get_settings()
+
+    app = FastAPI(
+        title="Document Analysis Service",
+        description="Word document parsing service with numbered sections extraction",
+        version="0.1.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        # Responses carry large HTML/JSON strings; orjson encodes them much faster
+        default_response_class=ORJSONResponse,
+    )
+
+    # Enforce the upload size limit before the body is parsed
+    app.add_middleware(RequestSizeLimitMiddleware)
+
+    # Configure CORS
     app.add_middleware(
-        GZipMiddleware,
-        minimum_size=settings.gzip_min_size,
-        compresslevel=settings.gzip_level,
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
     )
-    logger.info(f"Gzip compression enabled (level={settings.gzip_level}, min_size={settings.gzip_min_size})")
-
-# Include routes
-app.include_router(routes.router)
-
-# Root endpoint
-@app.get("/")
-def root():
-    """Root endpoint."""
-    return {
-        "service": "Document Analysis Service",
-        "version": "0.1.0",
-        "endpoints": {
-            "health": "/health",
-            "api": settings.api_prefix,
-            "docs": "/docs",
-        },
-    }
-
-
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup."""
-    logger.info("Starting Document Analysis Service")
-    init_db()
-    logger.info("Database tables initialized")
+
+    # Configure Gzip compression
+    if settings.enable_gzip:
+        app.add_middleware(
+            GZipMiddleware,
+            minimum_size=settings.gzip_min_size,
+            compresslevel=settings.gzip_level,
+        )
+        logger.info(f"Gzip compression enabled (level={settings.gzip_level}, min_size={settings.gzip_min_size})")
+
+    # Include routes
+    app.include_router(routes.router, prefix=settings.api_prefix)
+
+    # Root endpoint
+    @app.get("/")
+    def root():
+        """Root endpoint."""
+        return {
+            "service": "Document Analysis Service",
+            "version": "0.1.0",
+            "endpoints": {
+                "health": "/health",
+                "api": settings.api_prefix,
+                "docs": "/docs",
+            },
+        }
+
+    # Startup event
+    @app.on_event("startup")
+    async def startup_event():
+        """Run on application startup."""
+        logger.info("Starting Document Analysis Service")
+        init_db()
+        logger.info("Database tables initialized")
+        routes.start_parse_pool()
+
+    # Shutdown event
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        """Run on application shutdown."""
+        routes.shutdown_parse_pool()
+
+    return app
+
+
+app = create_app()
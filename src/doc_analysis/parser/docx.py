@@ -1,32 +1,85 @@
 """Word document parser - main parser module."""
-import base64
 import io
 import hashlib
 import re
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import zipfile
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, Iterator, Union
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.package import Unmarshaller
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.part import PartFactory
+from docx.opc.pkgreader import PackageReader, _ContentTypeMap
+from docx.oxml.ns import nsmap, qn
+from docx.oxml.parser import element_class_lookup, oxml_parser
 from docx.oxml.table import CT_Tbl
 from docx.oxml.text.paragraph import CT_P
-from docx.table import _Cell, Table
+from docx.package import Package
 from docx.text.paragraph import Paragraph
+from lxml import etree
 
 from src.doc_analysis.parser.numbering import (
     WordNumberingExtractor,
+    get_num_pr,
 )
 from src.doc_analysis.logger import get_logger
-from src.doc_analysis.config import settings
+from src.doc_analysis.config import get_settings
 from src.doc_analysis.parser.renderer import (
     RichTextRenderer,
     RenderedImage,
     RenderedTable,
     table_to_html,
     table_to_json,
-    encode_image_to_base64,
 )
 
+# Qualified tag names used when scanning paragraph XML for embedded images
+_W_DRAWING = qn("w:drawing")
+_A_BLIP = qn("a:blip")
+_R_EMBED = qn("r:embed")
+
+# Run content that CT_P.text renders as non-whitespace
+_W_T = qn("w:t")
+_W_NO_BREAK_HYPHEN = qn("w:noBreakHyphen")
+_W_VAL = qn("w:val")
+
+# Compiled once and reused for every table in every document
+_NS = {"w": nsmap["w"]}
+_TBL_ROWS = etree.XPath("./w:tr", namespaces=_NS)
+_ROW_CELLS = etree.XPath("./w:tc", namespaces=_NS)
+_CELL_PARAGRAPHS = etree.XPath("./w:p", namespaces=_NS)
+_CELL_GRID_SPAN = etree.XPath("./w:tcPr/w:gridSpan/@w:val", namespaces=_NS)
+_CELL_V_MERGE = etree.XPath("./w:tcPr/w:vMerge", namespaces=_NS)
+_P_STYLE_ID = etree.XPath("./w:pPr/w:pStyle/@w:val", namespaces=_NS)
+
+# Title after a leading "1.2.3 " number (legacy parse())
+_NUMBERED_TITLE = re.compile(r"^[\d.]+\s+(.+)$")
+
+# Streaming of the main document part (see _open_document)
+_W_BODY = qn("w:body")
+_BODY_TAGS = (qn("w:p"), qn("w:tbl"))
+_BODY_CHUNK_SIZE = 64 * 1024
+_EMPTY_DOCUMENT_XML = f'<w:document xmlns:w="{nsmap["w"]}"><w:body/></w:document>'.encode()
+
+# Image parts are only accepted with a plain image/* content type; the type
+# ends up in data URIs, so anything else (quotes, parameters) is rejected
+_IMAGE_MIME_TYPE = re.compile(r"image/[\w.+-]+")
+
+# Heading level -> label ("h1", "h2", ...), covering the supported levels 1-9
+_HEADING_LABELS = tuple(f"h{level}" for level in range(10))
+
+
+@lru_cache(maxsize=256)
+def _style_heading_level(style_name: str, max_level: int) -> Optional[int]:
+    """Heading level for a lower-cased style name (bounded memo per name)."""
+    for level in range(1, max_level + 1):
+        if f"heading {level}" in style_name:
+            return level
+    return None
+
 
 @dataclass
 class ContentItem:
@@ -87,22 +140,37 @@ class DocxParser:
         self.current_section: Optional[ParsedSection] = None
         self.section_stack: List[Tuple[str, ParsedSection]] = []
         self._images: List[RenderedImage] = []
+        self._rel_to_image: Dict[str, RenderedImage] = {}
+        self._paragraph_styles: Dict[Optional[str], Any] = {}
+
+    def _get_paragraph_style(self, paragraph: Paragraph) -> Any:
+        """Get the paragraph's style, resolved once per style ID per document.
+
+        ``Paragraph.style`` looks the style up in the styles part on every
+        access (and scans all styles for the default); the raw ``w:pStyle``
+        value is enough to reuse the first result.
+        """
+        style_ids = _P_STYLE_ID(paragraph._element)
+        style_id = style_ids[0] if style_ids else None
+        if style_id not in self._paragraph_styles:
+            self._paragraph_styles[style_id] = paragraph.style
+        return self._paragraph_styles[style_id]
 
     def _get_heading_level(self, paragraph: Paragraph) -> Optional[int]:
         """Determine heading level from paragraph style."""
-        if paragraph.style is None:
+        style = self._get_paragraph_style(paragraph)
+        if style is None:
             return None
         
-        style_name = paragraph.style.name.lower() if paragraph.style.name else ""
-        
+        style_name = style.name.lower() if style.name else ""
+
         # Support heading levels 1 to max_heading_level
-        for level in range(1, settings.max_heading_level + 1):
-            if f"heading {level}" in style_name:
-                return level
-        return None
+        return _style_heading_level(style_name, get_settings().max_heading_level)
 
     def _get_heading_label(self, level: int) -> str:
         """Get heading label like 'h1', 'h2', etc."""
+        if 0 <= level < len(_HEADING_LABELS):
+            return _HEADING_LABELS[level]
         return f"h{level}"
 
     def _get_list_info(self, paragraph: Paragraph) -> Optional[Dict[str, Any]]:
@@ -114,31 +182,26 @@ class DocxParser:
             {"type": "bullet", "level": int, "num_id": int} - 无序列表
         """
         try:
-            element = paragraph._element
-            numPr = None
-
             # First check paragraph's pPr for numPr (explicit numbering)
-            if element.pPr is not None and element.pPr.numPr is not None:
-                numPr = element.pPr.numPr
+            num_pr = get_num_pr(paragraph._element)
 
             # If not found, check the style's pPr (style-based lists)
-            if numPr is None and paragraph.style is not None:
-                style_element = paragraph.style._element
-                if style_element.pPr is not None and style_element.pPr.numPr is not None:
-                    numPr = style_element.pPr.numPr
+            if num_pr is None:
+                style = self._get_paragraph_style(paragraph)
+                if style is not None:
+                    num_pr = get_num_pr(style._element)
 
-            if numPr is None:
+            if num_pr is None:
                 return None
 
-            ilvl = numPr.ilvl.val if numPr.ilvl is not None else 0
-            num_id = numPr.numId.val if numPr.numId is not None else 0
+            num_id, ilvl = num_pr
 
             # 通过 numbering.xml 判断列表类型
             list_type = self._get_list_type_from_num_id(num_id)
 
             return {"type": list_type, "level": ilvl, "num_id": num_id}
 
-        except (AttributeError, TypeError):
+        except (AttributeError, TypeError, ValueError):
             return None
 
     def _get_list_type_from_num_id(self, num_id: int) -> str:
@@ -191,33 +254,82 @@ class DocxParser:
         else:
             return f"{indent}- {text}"
 
-    def parse_by_heading(self, file_content: bytes, filename: str) -> ParsedDocument:
+    def _open_source(
+        self,
+        file_content: Union[bytes, BinaryIO],
+        file_hash: Optional[str] = None,
+        file_size: Optional[int] = None,
+    ) -> Tuple[BinaryIO, str, int]:
+        """Get a readable stream plus SHA256 hash and size for the source.
+
+        File-like sources are hashed with hashlib.file_digest and rewound, so they are never
+        copied into a single bytes object. Hashing is skipped entirely when
+        the caller already knows the hash and size.
+
+        Args:
+            file_content: Raw file content as bytes, or a seekable binary file
+            file_hash: Precomputed SHA256 hex digest of the content
+            file_size: Precomputed content size in bytes
+
+        Returns:
+            Tuple of (stream positioned at start, file_hash, file_size)
+        """
+        if file_hash is not None and file_size is not None:
+            if isinstance(file_content, (bytes, bytearray)):
+                return io.BytesIO(file_content), file_hash, file_size
+            file_content.seek(0)
+            return file_content, file_hash, file_size
+
+        if isinstance(file_content, (bytes, bytearray)):
+            return (
+                io.BytesIO(file_content),
+                hashlib.sha256(file_content).hexdigest(),
+                len(file_content),
+            )
+
+        # file_digest reads into one reusable buffer (or hashes a BytesIO's
+        # buffer in place) instead of allocating a bytes object per chunk
+        file_content.seek(0)
+        file_hash = hashlib.file_digest(file_content, "sha256").hexdigest()
+        file_size = file_content.seek(0, io.SEEK_END)
+        file_content.seek(0)
+        return file_content, file_hash, file_size
+
+    def parse_by_heading(
+        self,
+        file_content: Union[bytes, BinaryIO],
+        filename: str,
+        file_hash: Optional[str] = None,
+        file_size: Optional[int] = None,
+    ) -> ParsedDocument:
         """Parse a Word document using heading styles (h1, h2, h3, h4, h5).
         
         Args:
-            file_content: Raw file content as bytes
+            file_content: Raw file content as bytes, or a seekable binary file
             filename: Original filename
+            file_hash: Precomputed SHA256 hex digest; computed if omitted
+            file_size: Precomputed size in bytes; computed if omitted
             
         Returns:
             ParsedDocument with all sections
         """
         # Calculate file info
-        file_hash = hashlib.sha256(file_content).hexdigest()
-        file_size = len(file_content)
+        stream, file_hash, file_size = self._open_source(file_content, file_hash, file_size)
         
         # Reset state
         self.sections = []
         self.current_section = None
         self.section_stack = []
         self._images = []
+        self._paragraph_styles = {}
         
-        # Counters for each level (support levels 1 to max_heading_level)
-        max_level = settings.max_heading_level + 1
-        counters = {level: 0 for level in range(1, max_level)}
-        current_context = {}
+        # Counters and parent context per level, indexed 1..max_heading_level
+        max_level = get_settings().max_heading_level + 1
+        counters = [0] * max_level
+        current_context: List[Optional[Dict[str, str]]] = [None] * max_level
         
         # Load document
-        doc = Document(io.BytesIO(file_content))
+        doc, body_elements = _open_document(stream)
 
         # Initialize numbering extractor for list type detection
         self.numbering_extractor = WordNumberingExtractor(doc)
@@ -230,105 +342,80 @@ class DocxParser:
             "counters": {}       # 各级别计数器 {level: count}
         }
 
-        # Extract all images first
+        # Extract all images first (also builds the relationship ID -> image map)
         self._extract_all_images(doc)
         # Track which images have been assigned
         assigned_images = set()
-        # Reset relationship to image mapping
-        self._rel_to_image = {}
 
-        # Iterate through document elements
-        for element in doc.element.body:
+        # Iterate through document elements (single streaming pass over the body)
+        for element in body_elements:
             if isinstance(element, CT_P):
-                # Create Paragraph object from element
-                paragraph = Paragraph(element, doc)
-                text = paragraph.text.strip()
-
-                # Check if this paragraph contains images
+                # Scan the paragraph subtree once for text, drawings and image references
+                has_text = False
                 has_images = False
-                for child in paragraph._element.iter():
-                    if child.tag.endswith('drawing'):
+                blip_embeds = []
+                for child in element.iter(_W_T, _W_NO_BREAK_HYPHEN, _W_DRAWING, _A_BLIP):
+                    tag = child.tag
+                    if tag == _W_T:
+                        has_text = has_text or bool(child.text)
+                    elif tag == _W_NO_BREAK_HYPHEN:
+                        has_text = True
+                    elif tag == _W_DRAWING:
                         has_images = True
-                        break
+                    else:
+                        embed = child.get(_R_EMBED)
+                        if embed:
+                            blip_embeds.append(embed)
 
                 # Skip only if both text and images are empty
+                if not has_text and not has_images:
+                    continue
+                text = element.text.strip() if has_text else ""
                 if not text and not has_images:
                     continue
 
+                # Create Paragraph object from element
+                paragraph = Paragraph(element, doc)
+
                 # Collect images in this paragraph
                 paragraph_images = []
                 if has_images:
-                    # Build a mapping from relationship ID to image (only once)
-                    if not self._rel_to_image:
-                        for rel in doc.part.rels.values():
-                            if "image" in rel.target_ref:
-                                image_filename = rel.target_ref.split("/")[-1]
-                                for img in self._images:
-                                    if img.filename == image_filename:
-                                        self._rel_to_image[rel.rId] = img
-                                        break
-
-
-                    # Get blip elements to find image references in this paragraph
-                    for child in paragraph._element.iter():
-                        if child.tag.endswith('blip'):
-                            # Extract image relationship ID
-                            embed = child.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
-                            if embed and embed in self._rel_to_image:
-                                img = self._rel_to_image[embed]
-                                if img.filename not in assigned_images:
-                                    paragraph_images.append(img)
-                                    assigned_images.add(img.filename)
+                    for embed in blip_embeds:
+                        if embed in self._rel_to_image:
+                            img = self._rel_to_image[embed]
+                            if img.filename not in assigned_images:
+                                paragraph_images.append(img)
+                                assigned_images.add(img.filename)
 
                 heading_level = self._get_heading_level(paragraph)
                 
                 if heading_level is not None:
-                    # Increment counter for this level
+                    # Increment counter for this level and reset deeper levels
                     counters[heading_level] += 1
+                    counters[heading_level + 1:] = [0] * (max_level - heading_level - 1)
 
-                    # Reset deeper level counters
-                    for level in range(heading_level + 1, max_level):
-                        counters[level] = 0
-                    
                     # Build number path
-                    number_parts = []
-                    for level in range(1, heading_level + 1):
-                        number_parts.append(str(counters[level]))
-                    number_path = ".".join(number_parts)
+                    number_path = ".".join(map(str, counters[1:heading_level + 1]))
                     
                     heading_label = self._get_heading_label(heading_level)
-                    
-                    # Create new section
+
+                    # Create new section. Context entries are already in parent
+                    # form, so siblings share their (read-only) parent dict
                     section = ParsedSection(
                         heading=heading_label,
                         number_path=number_path,
                         level=heading_level,
+                        parent=current_context[heading_level - 1] if heading_level > 1 else None,
                         title=text,
                     )
-                    
-                    # Set parent context
-                    if heading_level > 1:
-                        parent_level = heading_level - 1
-                        parent_label = self._get_heading_label(parent_level)
-                        if parent_label in current_context:
-                            parent_info = current_context[parent_label]
-                            section.parent = {
-                                "heading": parent_label,
-                                "number_path": parent_info["number_path"],
-                                "title": parent_info["title"]
-                            }
-                    
-                    # Update context
-                    current_context[heading_label] = {
+
+                    # Update context and clear deeper levels
+                    current_context[heading_level] = {
+                        "heading": heading_label,
                         "number_path": number_path,
-                        "title": text
+                        "title": text,
                     }
-                    
-                    # Clear deeper levels
-                    for l in range(heading_level + 1, max_level):
-                        label = self._get_heading_label(l)
-                        if label in current_context:
-                            del current_context[label]
+                    current_context[heading_level + 1:] = [None] * (max_level - heading_level - 1)
                     
                     # Reset list state when starting a new section
                     list_state["num_id"] = None
@@ -392,17 +479,16 @@ class DocxParser:
                         # Add to ordered content items
                         self.current_section.content_items.append(ContentItem(type="paragraph", data=text))
 
-                    # Add images from this paragraph to current section
+                    # Add images from this paragraph to current section. Filenames
+                    # are unique here: assigned_images hands each one out only once
                     for image in paragraph_images:
-                        if image.filename not in [img.filename for img in self.current_section.images]:
-                            self.current_section.images.append(image)
-                            # Add to ordered content items
-                            self.current_section.content_items.append(ContentItem(type="image", data=image))
+                        self.current_section.images.append(image)
+                        # Add to ordered content items
+                        self.current_section.content_items.append(ContentItem(type="image", data=image))
 
             elif isinstance(element, CT_Tbl):
-                # Create Table object from element
-                table = Table(element, doc)
-                rendered_table = self._process_table_and_return(table, element)
+                # Tables are read straight from the XML element
+                rendered_table = self._process_table_and_return(element)
                 if rendered_table and self.current_section is not None:
                     # Add to ordered content items
                     self.current_section.content_items.append(ContentItem(type="table", data=rendered_table))
@@ -417,28 +503,28 @@ class DocxParser:
             sections=self.sections,
         )
 
-    def parse(self, file_content: bytes, filename: str) -> ParsedDocument:
-        """Parse a Word document from bytes.
+    def parse(self, file_content: Union[bytes, BinaryIO], filename: str) -> ParsedDocument:
+        """Parse a Word document from bytes or a binary file.
 
         Args:
-            file_content: Raw file content as bytes
+            file_content: Raw file content as bytes, or a seekable binary file
             filename: Original filename
 
         Returns:
             ParsedDocument with all sections
         """
         # Calculate file info
-        file_hash = hashlib.sha256(file_content).hexdigest()
-        file_size = len(file_content)
+        stream, file_hash, file_size = self._open_source(file_content)
 
         # Reset state
         self.sections = []
         self.current_section = None
         self.section_stack = []
         self._images = []
+        self._paragraph_styles = {}
 
         # Load document
-        doc = Document(io.BytesIO(file_content))
+        doc, body_elements = _open_document(stream)
 
         # Initialize numbering extractor with the document
         self.numbering_extractor = WordNumberingExtractor(doc)
@@ -447,15 +533,13 @@ class DocxParser:
         self._extract_all_images(doc)
 
         # Iterate through document elements
-        for element in doc.element.body:
+        for element in body_elements:
             if isinstance(element, CT_P):
                 # Create Paragraph object from element
                 paragraph = Paragraph(element, doc)
                 self._process_paragraph(paragraph, element)
             elif isinstance(element, CT_Tbl):
-                # Create Table object from element
-                table = Table(element, doc)
-                self._process_table(table, element)
+                self._process_table(element)
 
         # Finalize last section
         if self.current_section is not None:
@@ -470,14 +554,28 @@ class DocxParser:
         )
 
     def _extract_all_images(self, doc: Document) -> None:
-        """Extract all images from the document."""
+        """Extract all images from the document.
+
+        Also maps each image relationship ID to its image. Relationships that
+        share a filename (e.g. several references to one media part) map to a
+        single image, which is extracted only once.
+        """
+        self._rel_to_image = {}
+        images_by_filename: Dict[str, RenderedImage] = {}
         image_index = 0
         for rel in doc.part.rels.values():
             if "image" in rel.target_ref:
                 try:
-                    image_data = rel.target_part.blob
-                    base64_str = base64.b64encode(image_data).decode("utf-8")
                     mime_type = rel.target_part.content_type
+                    if not _IMAGE_MIME_TYPE.fullmatch(mime_type):
+                        raise ValueError(f"unsupported image content type {mime_type!r}")
+                    filename = rel.target_ref.split("/")[-1]
+                    existing = images_by_filename.get(filename)
+                    if existing is not None:
+                        # Another relationship to an image already extracted
+                        self._rel_to_image[rel.rId] = existing
+                        continue
+                    image_data = rel.target_part.blob
 
                     # Try to get dimensions
                     width = None
@@ -486,14 +584,17 @@ class DocxParser:
                     # You could use PIL/Pillow if needed
 
                     image = RenderedImage(
-                        filename=rel.target_ref.split("/")[-1],
+                        filename=filename,
                         mime_type=mime_type,
-                        base64_data=base64_str,
                         width=width,
                         height=height,
+                        data=image_data,
                     )
                     self._images.append(image)
                     image_index += 1
+
+                    images_by_filename[filename] = image
+                    self._rel_to_image[rel.rId] = image
                 except (KeyError, ValueError, AttributeError) as e:
                     # Skip images with invalid data
                     self.logger.debug(f"Skipping invalid image: {e}")
@@ -533,7 +634,7 @@ class DocxParser:
 
             # Extract title (remove number prefix if present)
             title = text
-            match = re.match(r"^[\d.]+\s+(.+)$", text)
+            match = _NUMBERED_TITLE.match(text)
             if match:
                 title = match.group(1).strip()
 
@@ -551,20 +652,15 @@ class DocxParser:
             if self.current_section is not None and text:
                 self.current_section.paragraphs.append(text)
 
-    def _process_table(self, table: Table, element: CT_Tbl) -> None:
+    def _process_table(self, element: CT_Tbl) -> None:
         """Process a table element."""
-        rendered = self._process_table_and_return(table, element)
+        rendered = self._process_table_and_return(element)
         if rendered and self.current_section is not None:
             self.current_section.tables.append(rendered)
 
-    def _process_table_and_return(self, table: Table, element: CT_Tbl) -> Optional[RenderedTable]:
+    def _process_table_and_return(self, element: CT_Tbl) -> Optional[RenderedTable]:
         """Process a table element and return the rendered table."""
-        rows_data = []
-        for row in table.rows:
-            row_data = []
-            for cell in row.cells:
-                row_data.append(cell.text.strip())
-            rows_data.append(row_data)
+        rows_data = _extract_table_rows(element)
 
         if rows_data:
             rendered = RenderedTable(
@@ -583,11 +679,181 @@ class DocxParser:
         self.current_section = None
 
 
-def parse_docx_file(file_content: bytes, filename: str) -> ParsedDocument:
+def _open_document(stream: BinaryIO) -> Tuple[Document, Iterator[Any]]:
+    """Open a .docx package and stream the elements of its body.
+
+    python-docx parses the whole main document part into one tree when a
+    package is opened. Instead, the package is opened with an empty body,
+    so styles, numbering and relationships still come from python-docx,
+    and the real document part is pull-parsed. Each top-level ``w:p`` /
+    ``w:tbl`` is yielded once complete and discarded after the caller has
+    processed it, keeping memory proportional to a single body element.
+
+    The package is read in place: python-docx loads every part except the
+    main one straight from the upload's zip, so no copy of the package (or
+    of its media) is made.
+
+    Args:
+        stream: Seekable binary stream of the .docx package
+
+    Returns:
+        Tuple of (Document without body content, iterator over body elements)
+    """
+    package = zipfile.ZipFile(stream)
+    main_part = _main_part_name(package)
+
+    # Same steps as docx.Document(), with a reader that blanks the main part
+    phys_reader = _BodylessPackageReader(package, main_part)
+    content_types = _ContentTypeMap.from_xml(phys_reader.content_types_xml)
+    pkg_srels = PackageReader._srels_for(phys_reader, PACKAGE_URI)
+    sparts = PackageReader._load_serialized_parts(phys_reader, pkg_srels, content_types)
+    opc_package = Package()
+    Unmarshaller.unmarshal(
+        PackageReader(content_types, pkg_srels, sparts), opc_package, PartFactory
+    )
+    document_part = opc_package.main_document_part
+    if document_part.content_type != CT.WML_DOCUMENT_MAIN:
+        raise ValueError(f"not a Word file, content type is '{document_part.content_type}'")
+
+    return document_part.document, _iter_body_elements(package, main_part)
+
+
+class _BodylessPackageReader:
+    """Physical package reader (python-docx ``PhysPkgReader`` interface) over
+    an open zip that serves the main document part with an empty body."""
+
+    def __init__(self, package: zipfile.ZipFile, main_part: str):
+        self._package = package
+        self._main_part = main_part
+
+    def blob_for(self, pack_uri) -> bytes:
+        if pack_uri.membername == self._main_part:
+            return _EMPTY_DOCUMENT_XML
+        return self._package.read(pack_uri.membername)
+
+    @property
+    def content_types_xml(self) -> bytes:
+        return self.blob_for(CONTENT_TYPES_URI)
+
+    def rels_xml_for(self, source_uri) -> Optional[bytes]:
+        try:
+            return self.blob_for(source_uri.rels_uri)
+        except KeyError:
+            return None
+
+
+def _main_part_name(package: zipfile.ZipFile) -> str:
+    """Get the zip member name of the main document part."""
+    rels = etree.fromstring(package.read("_rels/.rels"), oxml_parser)
+    for rel in rels:
+        if rel.get("Type") == RT.OFFICE_DOCUMENT:
+            return rel.get("Target").lstrip("/")
+    return "word/document.xml"
+
+
+def _iter_body_elements(package: zipfile.ZipFile, part_name: str) -> Iterator[Any]:
+    """Yield top-level paragraph and table elements of the document body.
+
+    Elements use python-docx's element classes (``CT_P``, ``CT_Tbl``) and
+    are cleared, together with preceding siblings, once the caller resumes.
+    """
+    parser = etree.XMLPullParser(
+        events=("end",), tag=_BODY_TAGS, remove_blank_text=True, resolve_entities=False
+    )
+    parser.set_element_class_lookup(element_class_lookup)
+
+    body = None
+    with package, package.open(part_name) as xml:
+        while True:
+            chunk = xml.read(_BODY_CHUNK_SIZE)
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+
+            for _, element in parser.read_events():
+                parent = element.getparent()
+                if body is None and parent is not None and parent.tag == _W_BODY:
+                    body = parent  # resolved once, then compared by identity
+                if body is None or parent is not body:
+                    continue  # nested inside a table cell, text box, etc.
+                yield element
+                element.clear()
+                while element.getprevious() is not None:
+                    del body[0]
+
+            if not chunk:
+                break
+
+
+def _extract_table_rows(element: CT_Tbl) -> List[List[str]]:
+    """Extract the stripped text of every cell, row by row.
+
+    Matches ``Table.rows``/``_Cell.text``: horizontally spanned cells are
+    repeated and vertically merged cells repeat the cell above. Walks the
+    table XML directly because ``_Row.cells`` rebuilds the whole cell grid
+    for every row.
+
+    Args:
+        element: Table XML element
+
+    Returns:
+        List of rows, each row is a list of cell strings
+    """
+    rows_data = []
+    prev_row: List[str] = []
+    for tr in _TBL_ROWS(element):
+        row_data: List[str] = []
+        for tc in _ROW_CELLS(tr):
+            grid_span = _CELL_GRID_SPAN(tc)
+            span = int(grid_span[0]) if grid_span else 1
+
+            v_merge = _CELL_V_MERGE(tc)
+            if v_merge and v_merge[0].get(_W_VAL, "continue") == "continue":
+                # Continuation of a vertical merge: reuse the text above
+                start = len(row_data)
+                above = prev_row[start:start + span]
+                row_data.extend(above + [""] * (span - len(above)))
+                continue
+
+            text = "\n".join(p.text for p in _CELL_PARAGRAPHS(tc)).strip()
+            row_data.extend([text] * span)
+        rows_data.append(row_data)
+        prev_row = row_data
+    return rows_data
+
+
+def parse_docx_by_heading(
+    file_content: Union[bytes, BinaryIO],
+    filename: str,
+    file_hash: Optional[str] = None,
+    file_size: Optional[int] = None,
+) -> ParsedDocument:
+    """Parse a DOCX file using heading styles with a fresh parser.
+
+    Module-level so it can be submitted to a process pool.
+
+    Args:
+        file_content: Raw file content as bytes, or a seekable binary file
+        filename: Original filename
+        file_hash: Precomputed SHA256 hex digest; computed if omitted
+        file_size: Precomputed size in bytes; computed if omitted
+
+    Returns:
+        ParsedDocument
+    """
+    parser = DocxParser()
+    return parser.parse_by_heading(file_content, filename, file_hash=file_hash, file_size=file_size)
+
+
+def parse_docx_file(file_content: Union[bytes, BinaryIO], filename: str) -> ParsedDocument:
     """Convenience function to parse a DOCX file.
 
+    Pass an open binary file (e.g. ``open(path, "rb")``) rather than its
+    bytes to avoid holding a full copy of the file in memory.
+
     Args:
-        file_content: Raw file content as bytes
+        file_content: Raw file content as bytes, or a seekable binary file
         filename: Original filename
 
     Returns:
@@ -1,14 +1,47 @@
 """Number extraction from Word XML."""
 import re
 import logging
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from dataclasses import dataclass, field
 from docx import Document
+from docx.oxml.ns import nsmap
+from lxml import etree
 
 from src.doc_analysis.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Compiled once and reused for every paragraph/style element
+_NS = {"w": nsmap["w"]}
+_NUMPR = etree.XPath("./w:pPr/w:numPr", namespaces=_NS)
+_NUMID = etree.XPath("./w:numId/@w:val", namespaces=_NS)
+_ILVL = etree.XPath("./w:ilvl/@w:val", namespaces=_NS)
+
+# "%N" level placeholders in w:lvlText templates, and a leading "1.2.3" number
+_LEVEL_PLACEHOLDER = re.compile(r"%(\d+)")
+_LEADING_NUMBER = re.compile(r"^(\d+(?:\.\d+)*\.?)\s+")
+
+
+def get_num_pr(element) -> Optional[Tuple[int, int]]:
+    """Read the numbering properties of a paragraph or style element.
+
+    Args:
+        element: ``w:p`` or ``w:style`` lxml element
+
+    Returns:
+        Tuple of (num_id, ilvl), or None if the element has no ``w:numPr``
+    """
+    num_pr = _NUMPR(element)
+    if not num_pr:
+        return None
+
+    num_id = _NUMID(num_pr[0])
+    ilvl = _ILVL(num_pr[0])
+    return (
+        int(num_id[0]) if num_id else 0,
+        int(ilvl[0]) if ilvl else 0,
+    )
+
 
 @dataclass
 class NumberInfo:
@@ -132,16 +165,12 @@ class WordNumberingExtractor:
         Returns:
             Generated number like "1.2" or "1)"
         """
-        result = template
-
-        # Find all %N patterns and replace them
-        for match in list(re.finditer(r"%(\d+)", result)):
+        def _counter(match: "re.Match[str]") -> str:
             idx = int(match.group(1)) - 1  # %1 -> index 0
-            if idx < len(counters):
-                result = result.replace(match.group(0), str(counters[idx]), 1)
+            return str(counters[idx]) if idx < len(counters) else match.group(0)
 
-        # Remove trailing dot if present
-        return result.rstrip(".")
+        # Replace all %N patterns in one pass, then remove trailing dot if present
+        return _LEVEL_PLACEHOLDER.sub(_counter, template).rstrip(".")
 
     def get_number_info(self, paragraph) -> Optional[NumberInfo]:
         """Get number information for a paragraph.
@@ -153,17 +182,11 @@ class WordNumberingExtractor:
             NumberInfo with actual display number, or None
         """
         try:
-            element = paragraph._element
-
-            if element.pPr is None:
-                return None
-
-            numPr = element.pPr.numPr
-            if numPr is None:
+            num_pr = get_num_pr(paragraph._element)
+            if num_pr is None:
                 return None
 
-            ilvl = numPr.ilvl.val if numPr.ilvl is not None else 0
-            numId = numPr.numId.val if numPr.numId is not None else 0
+            numId, ilvl = num_pr
 
             # Initialize counters for this numId
             if numId not in self._counters:
@@ -219,7 +242,7 @@ class WordNumberingExtractor:
 
             return NumberInfo(num_id=numId, ilvl=ilvl, number_path=number_path)
 
-        except (AttributeError, TypeError):
+        except (AttributeError, TypeError, ValueError):
             return None
 
     def reset(self) -> None:
@@ -291,23 +314,16 @@ def extract_number_from_paragraph(paragraph) -> Optional[NumberInfo]:
     """
     try:
         # Access the paragraph's XML element
-        element = paragraph._element
-
         # Check if paragraph has numbering properties
-        if element.pPr is None:
-            return None
-
-        numPr = element.pPr.numPr
-        if numPr is None:
+        num_pr = get_num_pr(paragraph._element)
+        if num_pr is None:
             return None
 
-        # Get numbering level and ID
-        ilvl = numPr.ilvl.val if numPr.ilvl is not None else 0
-        numId = numPr.numId.val if numPr.numId is not None else 0
+        numId, ilvl = num_pr
 
         return NumberInfo(num_id=numId, ilvl=ilvl, number_path="")
 
-    except (AttributeError, TypeError):
+    except (AttributeError, TypeError, ValueError):
         return None
 
 
@@ -328,8 +344,7 @@ def get_display_number(paragraph) -> Optional[str]:
         text = paragraph.text.strip()
 
         # Try to extract leading number pattern
-        import re
-        match = re.match(r"^(\d+(?:\.\d+)*\.?)\s+", text)
+        match = _LEADING_NUMBER.match(text)
         if match:
             return match.group(1)
 
@@ -1,35 +1,80 @@
 """Rich text renderer for HTML and JSON formats."""
 import base64
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+import html
+import re
+from typing import List, Dict, Any, Mapping, Optional
+from dataclasses import dataclass, field
 
+import orjson
 
-@dataclass
+# Image blocks may reference a section image by index instead of inlining it
+IMAGE_REF_PREFIX = "image://"
+# Only match image sources, so text that merely looks like a reference is kept.
+# Text is always escaped in HTML output, so "<img" cannot come from text.
+_IMAGE_REF_JSON_RE = re.compile(r'("src":\s*)"image://(\d+)"')
+_IMAGE_REF_HTML_RE = re.compile(r'(<img src=)"image://(\d+)"')
+_escape_html = html.escape
+
+
+@dataclass(slots=True)
 class RenderedImage:
-    """Rendered image data."""
+    """Rendered image data.
+
+    Either base64_data or the raw bytes in data must be given. When only
+    data is set, base64_data stays None until get_base64_data() encodes it.
+    Images compare equal when their metadata and decoded content match,
+    however the content was supplied.
+    """
 
     filename: str
     mime_type: str
-    base64_data: str
-    width: Optional[int]
-    height: Optional[int]
+    base64_data: Optional[str] = field(default=None, repr=False)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    data: Optional[bytes] = field(default=None, repr=False)  # Raw image bytes
+    _data_uri: Optional[str] = field(default=None, init=False, repr=False)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (
+            self.filename == other.filename
+            and self.mime_type == other.mime_type
+            and self.width == other.width
+            and self.height == other.height
+            and self.get_data() == other.get_data()
+        )
+
+    def get_data(self) -> bytes:
+        """Get raw image bytes, decoded from base64_data when data is not set."""
+        if self.data is not None:
+            return self.data
+        return base64.b64decode(self.base64_data or "")
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
         return {
             "filename": self.filename,
             "mime_type": self.mime_type,
-            "base64_data": self.base64_data,
+            "base64_data": self.get_base64_data(),
             "width": self.width,
             "height": self.height,
         }
 
+    def get_base64_data(self) -> str:
+        """Get base64 encoded image data, encoding the raw bytes on first use."""
+        if self.base64_data is None:
+            self.base64_data = encode_image_to_base64(self.data or b"", self.mime_type)
+        return self.base64_data
+
     def get_data_uri(self) -> str:
-        """Get data URI for embedding in HTML/JSON."""
-        return f"data:{self.mime_type};base64,{self.base64_data}"
+        """Get data URI for embedding in HTML/JSON (built once per image)."""
+        if self._data_uri is None:
+            self._data_uri = f"data:{self.mime_type};base64,{self.get_base64_data()}"
+        return self._data_uri
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RenderedTable:
     """Rendered table data."""
 
@@ -72,14 +117,20 @@ class RichTextRenderer:
             )
 
     def add_image(
-        self, image: RenderedImage, alt: Optional[str] = None
+        self, image: RenderedImage, alt: Optional[str] = None, image_index: Optional[int] = None
     ) -> None:
-        """Add an image block."""
+        """Add an image block.
+
+        If image_index is given, the block references the image as
+        ``image://<image_index>`` instead of embedding a data URI; see
+        resolve_image_refs().
+        """
+        src = f"{IMAGE_REF_PREFIX}{image_index}" if image_index is not None else image.get_data_uri()
         self.content_blocks.append(
             {
                 "type": "image",
                 "attrs": {
-                    "src": image.get_data_uri(),
+                    "src": src,
                     "alt": alt,
                     "width": image.width,
                     "height": image.height,
@@ -101,57 +152,83 @@ class RichTextRenderer:
             )
 
     def render_html(self) -> str:
-        """Render content as HTML string."""
+        """Render content as HTML string.
+
+        Text and attribute values are HTML-escaped here; the JSON blocks keep
+        raw text. Table and ``html`` blocks are already HTML and are emitted
+        as-is.
+        """
+        extract_text = _extract_text
+        escape = html.escape
         html_parts = []
+        append = html_parts.append
 
         for block in self.content_blocks:
             block_type = block.get("type")
 
-            if block_type == "heading":
-                level = block.get("attrs", {}).get("level", 2)
-                text = self._extract_text(block.get("content", []))
-                html_parts.append(f"<h{level}>{text}</h{level}>")
+            if block_type == "paragraph":
+                append(f"<p>{escape(extract_text(block.get('content', ())), False)}</p>")
+
+            elif block_type == "heading":
+                level = (block.get("attrs") or _EMPTY).get("level", 2)
+                append(f"<h{level}>{escape(extract_text(block.get('content', ())), False)}</h{level}>")
 
-            elif block_type == "paragraph":
-                text = self._extract_text(block.get("content", []))
-                html_parts.append(f"<p>{text}</p>")
+            elif block_type == "table":
+                append(block.get("html", ""))
 
             elif block_type == "image":
-                attrs = block.get("attrs", {})
-                src = attrs.get("src", "")
-                alt = attrs.get("alt", "")
+                attrs = block.get("attrs") or _EMPTY
                 width = attrs.get("width")
                 height = attrs.get("height")
-                img_attrs = f' src="{src}" alt="{alt}"'
+                append(f'<img src="{escape(attrs.get("src") or "")}" alt="{escape(attrs.get("alt") or "")}"')
                 if width:
-                    img_attrs += f' width="{width}"'
+                    append(f' width="{width}"')
                 if height:
-                    img_attrs += f' height="{height}"'
-                html_parts.append(f"<img{img_attrs} />")
-
-            elif block_type == "table":
-                html_parts.append(block.get("html", ""))
+                    append(f' height="{height}"')
+                append(" />")
 
             elif block_type == "html":
-                html_parts.append(block.get("content", ""))
+                append(block.get("content", ""))
 
         return "".join(html_parts)
 
+    @classmethod
+    def render_html_from_json(cls, doc_json: Dict[str, Any]) -> str:
+        """Render HTML from a document produced by render_json()."""
+        renderer = cls()
+        renderer.content_blocks = list(doc_json.get("content", []))
+        return renderer.render_html()
+
     def render_json(self) -> Dict[str, Any]:
-        """Render content as TipTap-compatible JSON."""
-        return {"type": "doc", "content": self.content_blocks}
+        """Render content as TipTap-compatible JSON.
+
+        The block list is copied so the result stays valid after clear().
+        """
+        return {"type": "doc", "content": list(self.content_blocks)}
+
+    def render_json_str(self) -> str:
+        """Render content as a TipTap-compatible JSON string."""
+        return orjson.dumps({"type": "doc", "content": self.content_blocks}).decode()
 
     def clear(self) -> None:
-        """Clear all content blocks."""
+        """Clear all content blocks so the renderer can be reused."""
         self.content_blocks.clear()
 
     def _extract_text(self, content: List[Dict[str, Any]]) -> str:
         """Extract text from content array."""
-        texts = []
-        for item in content:
-            if item.get("type") == "text":
-                texts.append(item.get("text", ""))
-        return "".join(texts)
+        return _extract_text(content)
+
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def _extract_text(content: List[Dict[str, Any]]) -> str:
+    """Concatenate the text nodes of a content array."""
+    if len(content) == 1:
+        # Blocks built by RichTextRenderer hold a single text node
+        item = content[0]
+        return item.get("text", "") if item.get("type") == "text" else ""
+    return "".join([item.get("text", "") for item in content if item.get("type") == "text"])
 
 
 def encode_image_to_base64(image_data: bytes, mime_type: str) -> str:
@@ -164,7 +241,38 @@ def encode_image_to_base64(image_data: bytes, mime_type: str) -> str:
     Returns:
         Base64 encoded string
     """
-    return base64.b64encode(image_data).decode("utf-8")
+    # Base64 output is pure ASCII, so skip the UTF-8 decoder
+    return base64.b64encode(image_data).decode("ascii")
+
+
+def resolve_image_refs(content: str, data_uris: Mapping[int, str], html: bool = False) -> str:
+    """Replace ``image://<index>`` image sources with data URIs.
+
+    Args:
+        content: JSON string from render_json_str(), or HTML rendered from it
+        data_uris: Mapping of image index to data URI
+        html: Whether content is HTML (matches ``<img src=...>``) rather
+            than JSON (matches ``"src": ...``)
+
+    Returns:
+        Content with known references resolved; unknown ones are kept
+    """
+    if IMAGE_REF_PREFIX not in content:
+        return content
+
+    # The data URI is encoded for its context, like every other rendered value
+    if html:
+        def _encode(data_uri: str) -> str:
+            return f'"{_escape_html(data_uri, quote=True)}"'
+    else:
+        def _encode(data_uri: str) -> str:
+            return orjson.dumps(data_uri).decode()
+
+    def _replace(match: "re.Match[str]") -> str:
+        data_uri = data_uris.get(int(match.group(2)))
+        return match.group(1) + _encode(data_uri) if data_uri is not None else match.group(0)
+
+    return (_IMAGE_REF_HTML_RE if html else _IMAGE_REF_JSON_RE).sub(_replace, content)
 
 
 def table_to_html(rows: List[List[str]]) -> str:
@@ -179,14 +287,17 @@ def table_to_html(rows: List[List[str]]) -> str:
     if not rows:
         return ""
 
-    html_parts = ["<table>"]
-
-    for i, row in enumerate(rows):
-        html_parts.append("<tr>")
-        for cell in row:
-            tag = "th" if i == 0 else "td"
-            html_parts.append(f"<{tag}>{cell}</{tag}>")
-        html_parts.append("</tr>")
+    escape = html.escape
+    # First row is the header; each row is built with a single join
+    header = "</th><th>".join([escape(cell, False) for cell in rows[0]])
+    html_parts = ["<table><tr><th>", header, "</th></tr>"] if rows[0] else ["<table><tr></tr>"]
+    for row in rows[1:]:
+        if row:
+            html_parts.append("<tr><td>")
+            html_parts.append("</td><td>".join([escape(cell, False) for cell in row]))
+            html_parts.append("</td></tr>")
+        else:
+            html_parts.append("<tr></tr>")
 
     html_parts.append("</table>")
     return "".join(html_parts)
@@ -204,19 +315,22 @@ def table_to_json(rows: List[List[str]]) -> Dict[str, Any]:
     if not rows:
         return {}
 
-    # Build table content
-    table_rows = []
-    for row_data in rows:
-        cells = []
-        for cell in row_data:
-            cells.append(
-                {
-                    "type": "tableCell",
-                    "content": [
-                        {"type": "paragraph", "content": [{"type": "text", "text": cell}]}
-                    ],
-                }
-            )
-        table_rows.append({"type": "tableRow", "content": cells})
+    # Cells with the same text share one tableCell node (empty and merged
+    # cells repeat a lot), so treat the result as read-only
+    cell_nodes: Dict[str, Dict[str, Any]] = {}
+
+    def cell_node(text: str) -> Dict[str, Any]:
+        node = cell_nodes.get(text)
+        if node is None:
+            node = cell_nodes[text] = {
+                "type": "tableCell",
+                "content": [{"type": "paragraph", "content": [{"type": "text", "text": text}]}],
+            }
+        return node
+
+    table_rows = [
+        {"type": "tableRow", "content": [cell_node(cell) for cell in row_data]}
+        for row_data in rows
+    ]
 
     return {"type": "table", "content": table_rows}
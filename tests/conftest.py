@@ -112,9 +112,9 @@ def client_no_db():
 # Document Parser Fixtures
 # =============================================================================
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_docx_content():
-    """Create a sample DOCX file content for testing."""
+    """Create a sample DOCX file content for testing (built once per session)."""
     from docx import Document
 
     doc = Document()
@@ -143,9 +143,9 @@ def sample_docx_content():
     return buffer.getvalue()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_large_docx():
-    """Create a large DOCX file for testing size limits."""
+    """Create a large DOCX file for testing size limits (built once per session)."""
     from docx import Document
 
     doc = Document()
@@ -162,6 +162,43 @@ def sample_large_docx():
     return buffer.getvalue()
 
 
+@pytest.fixture(scope="session")
+def png_content():
+    """A valid 1x1 PNG, enough for python-docx to read its header."""
+    import struct
+    import zlib
+
+    def chunk(tag, data):
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(b"\x00\x00\x00\x00"))
+        + chunk(b"IEND", b"")
+    )
+
+
+@pytest.fixture(scope="session")
+def docx_with_image(png_content):
+    """A document with one heading followed by a paragraph and an image."""
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph("Figures", style="Heading 1")
+    doc.add_paragraph("See below.")
+    doc.add_picture(BytesIO(png_content))
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
 @pytest.fixture
 def invalid_file_content():
     """Create invalid file content for testing error handling."""
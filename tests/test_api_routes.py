@@ -0,0 +1,236 @@
+"""Tests for the API routes and the request middleware."""
+import asyncio
+import base64
+import io
+import zipfile
+
+import orjson
+import pytest
+import starlette.formparsers
+from sqlalchemy import select
+
+from src.doc_analysis.config import get_settings
+from src.doc_analysis.db import crud
+from src.doc_analysis.db.models import ImageBlob
+from src.doc_analysis.main import _MULTIPART_OVERHEAD, app
+
+
+def _parse_url():
+    return f"{get_settings().api_prefix}/documents/parse"
+
+
+def _document_url(document_id):
+    return f"{get_settings().api_prefix}/documents/{document_id}"
+
+
+def _upload(client, content, filename="test.docx"):
+    response = client.post(_parse_url(), files={"file": (filename, content)})
+    assert response.status_code == 201
+    return response.json()
+
+
+def _pad_docx(content: bytes, size: int) -> bytes:
+    """Pad a .docx with an unreferenced stored member to exactly ``size`` bytes."""
+    padding = 0
+    while True:
+        output = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(content)) as source, zipfile.ZipFile(output, "w") as target:
+            for item in source.infolist():
+                target.writestr(item, source.read(item.filename))
+            target.writestr("customXml/padding.bin", b"\0" * padding)
+        padded = output.getvalue()
+        if len(padded) == size:
+            return padded
+        padding += size - len(padded)
+
+
+@pytest.fixture
+def one_mb_limit(monkeypatch):
+    """Limit uploads to 1 MB for the duration of a test."""
+    monkeypatch.setattr(get_settings(), "max_file_size_mb", 1)
+    return 1024 * 1024
+
+
+@pytest.fixture
+def multipart_parses(monkeypatch):
+    """Record each time Starlette starts parsing a multipart body."""
+    calls = []
+    parse = starlette.formparsers.MultiPartParser.parse
+
+    async def recording_parse(self):
+        calls.append(self)
+        return await parse(self)
+
+    monkeypatch.setattr(starlette.formparsers.MultiPartParser, "parse", recording_parse)
+    return calls
+
+
+class TestRequestSizeLimit:
+    """Oversized request bodies are rejected before the form is parsed."""
+
+    def test_declared_content_length_over_limit(self, client, one_mb_limit, multipart_parses):
+        response = client.post(
+            _parse_url(), files={"file": ("big.docx", b"x" * (one_mb_limit + _MULTIPART_OVERHEAD))}
+        )
+
+        assert response.status_code == 413
+        assert response.json() == {"detail": "File size exceeds maximum allowed size of 1MB"}
+        assert multipart_parses == []
+
+    def test_streamed_body_over_limit(self, one_mb_limit):
+        chunk_size = 64 * 1024
+        head = (
+            b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.docx\"\r\n"
+            b"Content-Type: application/octet-stream\r\n\r\n"
+        )
+        chunks = [head] + [b"x" * chunk_size] * 64 + [b"\r\n--b--\r\n"]
+        received = []
+        sent = []
+
+        async def receive():
+            received.append(chunks[len(received)])
+            return {
+                "type": "http.request",
+                "body": received[-1],
+                "more_body": len(received) < len(chunks),
+            }
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "client": ("testclient", 50000),
+            "root_path": "",
+            "path": _parse_url(),
+            "raw_path": _parse_url().encode(),
+            "query_string": b"",
+            # Chunked transfer: no Content-Length to check up front
+            "headers": [(b"content-type", b"multipart/form-data; boundary=b")],
+        }
+        asyncio.run(app(scope, receive, send))
+
+        assert sent[0]["type"] == "http.response.start"
+        assert sent[0]["status"] == 413
+        # Reading stopped at the first chunk past the limit
+        limit = one_mb_limit + _MULTIPART_OVERHEAD
+        assert sum(map(len, received)) - chunk_size <= limit < sum(map(len, received))
+
+    def test_upload_just_under_limit(self, client, one_mb_limit, sample_docx_content):
+        content = _pad_docx(sample_docx_content, one_mb_limit)
+
+        response = client.post(
+            _parse_url(),
+            files={"file": ("exact.docx", content, "application/octet-stream")},
+        )
+
+        assert response.status_code == 201
+        assert response.json()["sections_count"] == 3
+
+
+class TestParseDocument:
+    """Uploading, deduplicating and storing documents."""
+
+    def test_concurrent_duplicate_upload_returns_stored_document(
+        self, client, monkeypatch, sample_docx_content
+    ):
+        files = {"file": ("test.docx", sample_docx_content)}
+        first = client.post(_parse_url(), files=files)
+        assert first.status_code == 201
+
+        # The other upload commits between this request's duplicate check and
+        # its own insert, so the insert violates the unique file hash
+        get_document_by_hash = crud.get_document_by_hash
+        lookups = []
+
+        def racing_lookup(db, file_hash):
+            lookups.append(file_hash)
+            return None if len(lookups) == 1 else get_document_by_hash(db, file_hash)
+
+        monkeypatch.setattr(crud, "get_document_by_hash", racing_lookup)
+        second = client.post(_parse_url(), files=files)
+
+        assert second.status_code == 201
+        assert len(lookups) == 2
+        assert second.json() == first.json()
+
+    def test_upload_stores_sections(self, client, sample_docx_content):
+        parsed = _upload(client, sample_docx_content)
+
+        assert parsed["filename"].endswith("_test.docx")
+        assert parsed["sections_count"] == 3
+        assert [s["number_path"] for s in parsed["sections"]] == ["1", "1.1", "2"]
+        assert "This is the introduction." in parsed["sections"][0]["content_html"]
+
+    def test_duplicate_upload_returns_stored_document(self, client, sample_docx_content):
+        first = _upload(client, sample_docx_content)
+        second = _upload(client, sample_docx_content, filename="copy.docx")
+
+        assert second == first
+        listing = client.get(f"{get_settings().api_prefix}/documents").json()
+        assert listing["total"] == 1
+
+
+class TestImageReferences:
+    """image:// references are replaced with data URIs when serving content."""
+
+    @pytest.fixture(params=[False, True], ids=["without_images", "with_images"])
+    def include_images(self, request, monkeypatch):
+        monkeypatch.setattr(get_settings(), "include_images", request.param)
+        return request.param
+
+    @staticmethod
+    def _assert_resolved(section, data_uri):
+        blocks = orjson.loads(section["content_json"])["content"]
+        assert [b["attrs"]["src"] for b in blocks if b["type"] == "image"] == [data_uri]
+        assert f'<img src="{data_uri}"' in section["content_html"]
+        assert "image://" not in section["content_json"] + section["content_html"]
+
+    def test_document_and_section(self, client, include_images, docx_with_image, png_content):
+        data_uri = f"data:image/png;base64,{base64.b64encode(png_content).decode()}"
+        document_id = _upload(client, docx_with_image)["document_id"]
+
+        document = client.get(_document_url(document_id))
+        section = client.get(f"{_document_url(document_id)}/sections/1")
+
+        assert document.status_code == 200
+        assert section.status_code == 200
+        for served in (document.json()["sections"][0], section.json()):
+            self._assert_resolved(served, data_uri)
+            if include_images:
+                assert served["images"][0]["base64_data"] == data_uri.split(",", 1)[1]
+            else:
+                assert served["images"] == []
+
+
+class TestDeleteDocument:
+    """Deleting a document removes its rows and the image data only it used."""
+
+    def test_delete_cleans_up_orphaned_blobs(self, client, db_session, docx_with_image):
+        # A second file with the same picture shares its image blob
+        copy = _pad_docx(docx_with_image, len(docx_with_image) + 1024)
+        first = _upload(client, docx_with_image)["document_id"]
+        second = _upload(client, copy, filename="copy.docx")["document_id"]
+        assert first != second
+
+        def blob_count():
+            return len(db_session.execute(select(ImageBlob.hash)).all())
+
+        assert blob_count() == 1
+
+        assert client.delete(_document_url(first)).status_code == 204
+        assert client.get(_document_url(first)).status_code == 404
+        assert blob_count() == 1
+        section = client.get(f"{_document_url(second)}/sections/1").json()
+        assert "data:image/png;base64," in section["content_html"]
+
+        assert client.delete(_document_url(second)).status_code == 204
+        assert blob_count() == 0
+
+    def test_delete_missing_document(self, client):
+        assert client.delete(_document_url(12345)).status_code == 404
@@ -0,0 +1,244 @@
+"""Tests for database CRUD operations."""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from src.doc_analysis.db import crud
+from src.doc_analysis.db.models import (
+    Document,
+    ImageBlob,
+    NumberedSection,
+    SectionImage,
+)
+
+
+def _create_document(db, file_hash="hash-1"):
+    return crud.create_document(
+        db,
+        filename=f"{file_hash}.docx",
+        original_filename=f"{file_hash}.docx",
+        file_size=100,
+        file_hash=file_hash,
+    )
+
+
+def _section(number_path, level, sort_order, parent_path=None, title=None):
+    return {
+        "number_path": number_path,
+        "level": level,
+        "parent_path": parent_path,
+        "title": title or f"Section {number_path}",
+        "content_html": f"<p>{number_path}</p>",
+        "content_json": "{}",
+        "marked_content": "",
+        "sort_order": sort_order,
+    }
+
+
+def _image_row(section_id, blob_hash, index=0):
+    return {
+        "section_id": section_id,
+        "image_index": index,
+        "filename": f"image{index}.png",
+        "mime_type": "image/png",
+        "blob_hash": blob_hash,
+        "width": None,
+        "height": None,
+        "sort_order": index,
+    }
+
+
+@pytest.fixture
+def document_with_sections(db_session):
+    """A document with sections 1, 1.1, 1.2 and 2, committed."""
+    doc_id = _create_document(db_session).id
+    path_to_id = crud.bulk_create_sections(
+        db_session,
+        doc_id,
+        [
+            _section("1", 0, 0),
+            _section("1.1", 1, 1, parent_path="1"),
+            _section("1.2", 1, 2, parent_path="1"),
+            _section("2", 0, 3),
+        ],
+    )
+    crud.bulk_create_tables(
+        db_session,
+        [{
+            "section_id": path_to_id["1.1"],
+            "table_index": 0,
+            "row_count": 1,
+            "col_count": 1,
+            "html": "<table></table>",
+            "json_data": "[]",
+            "sort_order": 0,
+        }],
+    )
+    db_session.commit()
+    db_session.expunge_all()
+    return doc_id, path_to_id
+
+
+class TestDocumentCrud:
+    """Document creation, lookup and parse marking."""
+
+    def test_calculate_file_hash(self):
+        assert crud.calculate_file_hash(b"abc") == (
+            "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+        )
+
+    def test_create_and_get_document(self, db_session):
+        doc = _create_document(db_session)
+
+        assert doc.id is not None
+        assert crud.get_document_by_id(db_session, doc.id).file_hash == "hash-1"
+        assert crud.get_document_by_hash(db_session, "hash-1").id == doc.id
+        assert crud.get_document_by_hash(db_session, "missing") is None
+
+    def test_create_document_without_commit_is_rolled_back(self, db_session):
+        doc = crud.create_document(
+            db_session, "a.docx", "a.docx", 1, "uncommitted", commit=False
+        )
+        assert doc.id is not None
+
+        db_session.rollback()
+
+        assert crud.get_document_by_hash(db_session, "uncommitted") is None
+
+    def test_mark_document_parsed(self, db_session):
+        doc = _create_document(db_session)
+        assert doc.parsed_at is None
+
+        crud.mark_document_parsed(db_session, doc.id)
+        db_session.refresh(doc)
+
+        assert doc.parsed_at is not None
+
+    def test_documents_with_section_counts(self, db_session, document_with_sections):
+        doc_id, _ = document_with_sections
+        empty = _create_document(db_session, "hash-2")
+
+        documents, total, counts = crud.get_documents_with_section_counts(db_session)
+
+        assert total == 2
+        assert {doc.id for doc in documents} == {doc_id, empty.id}
+        assert counts == {doc_id: 4, empty.id: 0}
+
+
+class TestSectionCrud:
+    """Section insertion, loading and tree building."""
+
+    def test_bulk_create_sections_links_parents(self, db_session, document_with_sections):
+        doc_id, path_to_id = document_with_sections
+
+        parents = dict(
+            db_session.execute(
+                select(NumberedSection.number_path, NumberedSection.parent_id)
+                .where(NumberedSection.document_id == doc_id)
+            ).all()
+        )
+
+        assert parents == {
+            "1": None,
+            "1.1": path_to_id["1"],
+            "1.2": path_to_id["1"],
+            "2": None,
+        }
+
+    def test_bulk_create_sections_empty(self, db_session):
+        doc = _create_document(db_session)
+
+        assert crud.bulk_create_sections(db_session, doc.id, []) == {}
+
+    def test_get_sections_by_document_loads_tables_and_images(
+        self, db_session, document_with_sections
+    ):
+        doc_id, _ = document_with_sections
+
+        sections = crud.get_sections_by_document(db_session, doc_id)
+
+        assert [s.number_path for s in sections] == ["1", "1.1", "1.2", "2"]
+        assert [len(s.tables) for s in sections] == [0, 1, 0, 0]
+        assert all(s.images == [] for s in sections)
+
+    def test_get_sections_by_document_raises_on_unplanned_relationship(
+        self, db_session, document_with_sections
+    ):
+        doc_id, _ = document_with_sections
+        section = crud.get_sections_by_document(db_session, doc_id)[1]
+
+        with pytest.raises(InvalidRequestError):
+            section.parent
+        with pytest.raises(InvalidRequestError):
+            section.document
+
+    def test_get_section_by_path_loads_parent_and_children(
+        self, db_session, document_with_sections
+    ):
+        doc_id, path_to_id = document_with_sections
+
+        section = crud.get_section_by_path(db_session, doc_id, "1")
+        child = crud.get_section_by_path(db_session, doc_id, "1.1")
+
+        assert sorted(c.number_path for c in section.children) == ["1.1", "1.2"]
+        assert child.parent.id == path_to_id["1"]
+        assert len(child.tables) == 1
+        assert crud.get_section_by_path(db_session, doc_id, "9") is None
+
+    def test_get_section_by_path_raises_on_unplanned_relationship(
+        self, db_session, document_with_sections
+    ):
+        doc_id, _ = document_with_sections
+        section = crud.get_section_by_path(db_session, doc_id, "1.1")
+
+        with pytest.raises(InvalidRequestError):
+            section.document
+
+    def test_section_outline_builds_tree(self, db_session, document_with_sections):
+        doc_id, _ = document_with_sections
+
+        tree = crud.build_section_tree(crud.get_section_outline(db_session, doc_id))
+
+        assert [node["number_path"] for node in tree] == ["1", "2"]
+        assert [c["number_path"] for c in tree[0]["children"]] == ["1.1", "1.2"]
+        assert tree[1]["children"] == []
+
+
+class TestImageBlobCrud:
+    """Content-addressed image storage and cleanup on delete."""
+
+    def test_store_image_blobs_skips_existing(self, db_session):
+        crud.store_image_blobs(db_session, {"a": b"1", "b": b"2"})
+        db_session.commit()
+
+        crud.store_image_blobs(db_session, {"b": b"2", "c": b"3"})
+        db_session.commit()
+
+        hashes = db_session.execute(select(ImageBlob.hash).order_by(ImageBlob.hash))
+        assert hashes.scalars().all() == ["a", "b", "c"]
+
+    def test_delete_document_keeps_shared_blobs(self, db_session):
+        blob_owner = {}
+        for file_hash, blob_hashes in (("doc-1", ["shared", "only-1"]), ("doc-2", ["shared"])):
+            doc = _create_document(db_session, file_hash)
+            path_to_id = crud.bulk_create_sections(db_session, doc.id, [_section("1", 0, 0)])
+            crud.store_image_blobs(db_session, {h: h.encode() for h in blob_hashes})
+            crud.bulk_create_images(
+                db_session,
+                [_image_row(path_to_id["1"], h, i) for i, h in enumerate(blob_hashes)],
+            )
+            blob_owner[file_hash] = doc.id
+        db_session.commit()
+
+        assert crud.delete_document(db_session, blob_owner["doc-1"]) is True
+
+        remaining = db_session.execute(select(ImageBlob.hash)).scalars().all()
+        assert remaining == ["shared"]
+        assert db_session.query(SectionImage).count() == 1
+
+        assert crud.delete_document(db_session, blob_owner["doc-2"]) is True
+        assert db_session.query(ImageBlob).count() == 0
+        assert db_session.query(Document).count() == 0
+
+    def test_delete_missing_document(self, db_session):
+        assert crud.delete_document(db_session, 12345) is False
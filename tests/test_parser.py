@@ -0,0 +1,298 @@
+"""Tests for the Word document parser and rich text renderer."""
+import io
+import zipfile
+
+import orjson
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from lxml import etree
+
+from src.doc_analysis.parser.docx import (
+    DocxParser,
+    _iter_body_elements,
+    _main_part_name,
+    parse_docx_by_heading,
+)
+from src.doc_analysis.parser.renderer import (
+    RenderedImage,
+    RichTextRenderer,
+    resolve_image_refs,
+    table_to_html,
+)
+
+
+def _save(doc) -> bytes:
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _replace_in_part(content: bytes, part_name: str, old: bytes, new: bytes) -> bytes:
+    """Rewrite one part of a .docx package."""
+    source = zipfile.ZipFile(io.BytesIO(content))
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == part_name:
+                assert old in data
+                data = data.replace(old, new)
+            target.writestr(item, data)
+    return output.getvalue()
+
+
+class TestDocxParser:
+    """Section tree, numbering, tables and images from parse_by_heading."""
+
+    def test_parse_by_heading_simple(self, sample_docx_content):
+        parsed = DocxParser().parse_by_heading(sample_docx_content, "test.docx")
+
+        assert parsed.original_filename == "test.docx"
+        assert parsed.file_size == len(sample_docx_content)
+        assert len(parsed.file_hash) == 64
+        assert [s.number_path for s in parsed.sections] == ["1", "1.1", "2"]
+        assert [s.heading for s in parsed.sections] == ["h1", "h2", "h1"]
+        assert [s.title for s in parsed.sections] == [
+            "1.0 Introduction",
+            "1.1 Background",
+            "2.0 Methods",
+        ]
+        assert parsed.sections[0].paragraphs == ["This is the introduction."]
+
+    def test_parent_links(self, sample_docx_content):
+        sections = parse_docx_by_heading(sample_docx_content, "test.docx").sections
+
+        assert sections[0].parent is None
+        assert sections[1].parent == {
+            "heading": "h1",
+            "number_path": "1",
+            "title": "1.0 Introduction",
+        }
+        assert sections[2].parent is None
+
+    def test_numbering_resets_deeper_levels(self):
+        doc = Document()
+        for text, style in (
+            ("A", "Heading 1"),
+            ("A.a", "Heading 2"),
+            ("A.a.i", "Heading 3"),
+            ("A.b", "Heading 2"),
+            ("B", "Heading 1"),
+            ("B.a", "Heading 2"),
+        ):
+            doc.add_paragraph(text, style=style)
+
+        sections = parse_docx_by_heading(_save(doc), "nested.docx").sections
+
+        assert [(s.number_path, s.level) for s in sections] == [
+            ("1", 1),
+            ("1.1", 2),
+            ("1.1.1", 3),
+            ("1.2", 2),
+            ("2", 1),
+            ("2.1", 2),
+        ]
+        assert sections[2].parent["number_path"] == "1.1"
+        assert sections[5].parent["number_path"] == "2"
+
+    def test_file_object_matches_bytes(self, sample_docx_content):
+        from_bytes = parse_docx_by_heading(sample_docx_content, "test.docx")
+        from_file = parse_docx_by_heading(io.BytesIO(sample_docx_content), "test.docx")
+
+        assert from_file.file_hash == from_bytes.file_hash
+        assert from_file.sections == from_bytes.sections
+
+    def test_no_headings(self):
+        doc = Document()
+        doc.add_paragraph("Just text.")
+
+        assert parse_docx_by_heading(_save(doc), "plain.docx").sections == []
+
+    def test_table_rows(self):
+        doc = Document()
+        doc.add_paragraph("Data", style="Heading 1")
+        table = doc.add_table(rows=2, cols=2)
+        for row, values in zip(table.rows, (("Name", "Value"), ("a<b", "1"))):
+            for cell, value in zip(row.cells, values):
+                cell.text = value
+
+        section = parse_docx_by_heading(_save(doc), "table.docx").sections[0]
+        tables = [item.data for item in section.content_items if item.type == "table"]
+
+        assert len(tables) == 1
+        assert (tables[0].rows, tables[0].cols) == (2, 2)
+        assert tables[0].html == (
+            "<table><tr><th>Name</th><th>Value</th></tr>"
+            "<tr><td>a&lt;b</td><td>1</td></tr></table>"
+        )
+
+    def test_image_extraction(self, docx_with_image, png_content):
+        section = parse_docx_by_heading(docx_with_image, "image.docx").sections[0]
+
+        assert section.paragraphs == ["See below."]
+        assert len(section.images) == 1
+        image = section.images[0]
+        assert image.mime_type == "image/png"
+        assert image.data == png_content
+        assert [item.type for item in section.content_items] == ["paragraph", "image"]
+
+    def test_image_with_unsafe_content_type_is_skipped(self, docx_with_image):
+        tampered = _replace_in_part(
+            docx_with_image,
+            "[Content_Types].xml",
+            b'ContentType="image/png"',
+            b'ContentType="image/png&quot; onerror=&quot;alert(1)"',
+        )
+
+        section = parse_docx_by_heading(tampered, "image.docx").sections[0]
+
+        assert section.images == []
+
+
+@pytest.fixture(scope="module")
+def docx_with_edge_cases():
+    """Body with a content control, a nested table and the final sectPr."""
+    doc = Document()
+    doc.add_paragraph("Intro", style="Heading 1")
+    doc.add_paragraph("Before the control.")
+    sdt = parse_xml(
+        f"<w:sdt {nsdecls('w')}><w:sdtPr/><w:sdtContent>"
+        "<w:p><w:r><w:t>Inside the control</w:t></w:r></w:p>"
+        "</w:sdtContent></w:sdt>"
+    )
+    doc.element.body.insert(len(doc.element.body) - 1, sdt)
+    outer = doc.add_table(rows=1, cols=2)
+    outer.cell(0, 0).text = "Outer"
+    inner = outer.cell(0, 1).add_table(rows=1, cols=1)
+    inner.cell(0, 0).text = "Inner"
+    doc.add_paragraph("After the table.")
+    # python-docx keeps w:sectPr as the last body child
+    assert doc.element.body[-1].tag == qn("w:sectPr")
+    return _save(doc)
+
+
+class TestBodyStreaming:
+    """The streamed body walk matches python-docx's walk of the full tree."""
+
+    @staticmethod
+    def _streamed(content):
+        package = zipfile.ZipFile(io.BytesIO(content))
+        # Serialize each element when yielded; it is cleared afterwards
+        return [
+            etree.tostring(element)
+            for element in _iter_body_elements(package, _main_part_name(package))
+        ]
+
+    @staticmethod
+    def _python_docx_walk(content):
+        body = Document(io.BytesIO(content)).element.body
+        return [etree.tostring(e) for e in body.iterchildren(qn("w:p"), qn("w:tbl"))]
+
+    def test_matches_python_docx_body_walk(self, docx_with_edge_cases, sample_docx_content):
+        for content in (docx_with_edge_cases, sample_docx_content):
+            assert self._streamed(content) == self._python_docx_walk(content)
+
+    def test_edge_cases(self, docx_with_edge_cases):
+        tags = [etree.fromstring(e).tag for e in self._streamed(docx_with_edge_cases)]
+
+        # Only top-level paragraphs and tables: the control's paragraph, the
+        # nested table and its cell paragraphs, and sectPr are not yielded
+        assert tags == [qn("w:p"), qn("w:p"), qn("w:tbl"), qn("w:p")]
+
+    def test_parse_edge_cases(self, docx_with_edge_cases):
+        sections = parse_docx_by_heading(docx_with_edge_cases, "edge.docx").sections
+
+        assert len(sections) == 1
+        section = sections[0]
+        assert section.paragraphs == ["Before the control.", "After the table."]
+        tables = [item.data for item in section.content_items if item.type == "table"]
+        assert len(tables) == 1
+        assert (tables[0].rows, tables[0].cols) == (1, 2)
+        # Like python-docx's _Cell.text, a cell's text excludes nested tables
+        assert tables[0].html == "<table><tr><th>Outer</th><th></th></tr></table>"
+
+
+class TestRichTextRenderer:
+    """HTML escaping and image reference resolution."""
+
+    def test_image_equality_compares_content(self):
+        def image(**content):
+            return RenderedImage(filename="a.png", mime_type="image/png", **content)
+
+        assert image(base64_data="AAAA") != image(base64_data="BBBB")
+        assert image(data=b"xyz") == image(base64_data="eHl6")
+        assert image(data=b"xyz") != image(data=b"xy")
+        encoded = image(data=b"xyz")
+        encoded.get_data_uri()
+        assert encoded == image(data=b"xyz")
+
+    def test_html_escapes_text(self):
+        renderer = RichTextRenderer()
+        renderer.add_heading("1 <Intro> & more", level=2)
+        renderer.add_paragraph('<script>alert("x")</script>')
+
+        assert renderer.render_html() == (
+            "<h2>1 &lt;Intro&gt; &amp; more</h2>"
+            '<p>&lt;script&gt;alert("x")&lt;/script&gt;</p>'
+        )
+        # JSON keeps the raw text
+        assert renderer.render_json()["content"][1]["content"][0]["text"] == (
+            '<script>alert("x")</script>'
+        )
+
+    def test_html_escapes_image_attributes(self):
+        renderer = RichTextRenderer()
+        renderer.add_image(
+            RenderedImage(filename="a.png", mime_type="image/png", data=b"x"),
+            alt='"><script>',
+        )
+
+        assert 'alt="&quot;&gt;&lt;script&gt;"' in renderer.render_html()
+
+    def test_table_cells_are_escaped(self):
+        assert table_to_html([["<b>"], ["&"]]) == (
+            "<table><tr><th>&lt;b&gt;</th></tr><tr><td>&amp;</td></tr></table>"
+        )
+
+    def test_resolve_image_refs_json_and_html(self):
+        image = RenderedImage(filename="a.png", mime_type="image/png", data=b"png")
+        renderer = RichTextRenderer()
+        renderer.add_image(image, image_index=0)
+        renderer.add_image(image, image_index=5)
+        data_uris = {0: image.get_data_uri()}
+
+        content_json = resolve_image_refs(renderer.render_json_str(), data_uris)
+        blocks = orjson.loads(content_json)["content"]
+        assert blocks[0]["attrs"]["src"] == "data:image/png;base64,cG5n"
+        # Unknown indexes are kept as references
+        assert blocks[1]["attrs"]["src"] == "image://5"
+
+        content_html = resolve_image_refs(renderer.render_html(), data_uris, html=True)
+        assert content_html.startswith('<img src="data:image/png;base64,cG5n"')
+        assert 'src="image://5"' in content_html
+
+    def test_resolve_image_refs_encodes_mime_injection(self):
+        renderer = RichTextRenderer()
+        renderer.add_image(
+            RenderedImage(filename="a.png", mime_type="image/png", data=b"x"),
+            image_index=0,
+        )
+        data_uris = {0: 'data:image/png" onerror="alert(1);base64,eA=='}
+
+        content_html = resolve_image_refs(renderer.render_html(), data_uris, html=True)
+        assert 'onerror="' not in content_html
+        assert "image/png&quot; onerror=&quot;alert(1)" in content_html
+
+        content_json = resolve_image_refs(renderer.render_json_str(), data_uris)
+        src = orjson.loads(content_json)["content"][0]["attrs"]["src"]
+        assert src == data_uris[0]
+
+    def test_text_that_looks_like_a_reference_is_kept(self):
+        renderer = RichTextRenderer()
+        renderer.add_paragraph("image://0")
+
+        content_html = resolve_image_refs(renderer.render_html(), {0: "data:x"}, html=True)
+
+        assert content_html == "<p>image://0</p>"